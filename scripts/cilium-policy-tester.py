@@ -50,6 +50,8 @@ from kubernetes import client, config
 from kubernetes.client.rest import ApiException
 from kubernetes.stream import stream
 
+from k8s_raw import paginate_raw
+
 app = typer.Typer(help="Cilium policy testing CLI prototype")
 console = Console()
 
@@ -371,10 +373,11 @@ def cleanup(namespace: str = typer.Option('cilium-test', help='Namespace to clea
     v1 = client.CoreV1Api()
     # delete pods
     try:
-        pods = v1.list_namespaced_pod(namespace=namespace)
-        for p in pods.items:
+        # Only names are needed, so skip building V1Pod models for the list
+        pod_names = [p['metadata']['name'] for p in paginate_raw(v1.list_namespaced_pod, namespace=namespace)]
+        for name in pod_names:
             try:
-                v1.delete_namespaced_pod(name=p.metadata.name, namespace=namespace)
+                v1.delete_namespaced_pod(name=name, namespace=namespace)
             except Exception:
                 pass
     except ApiException as e:
@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+
+"""
+Shared audit engine for k8s_probes.py and k8s_limits_requests.py.
+
+Lists every pod once (one paginated all-namespaces request over a single
+pooled API connection) and hands each container to the selected auditors
+in the same pass. Each auditor gets its own report with the nested
+structure the scripts have always printed:
+
+  {namespace: {pod: {container: {...}}}}
+
+Namespaces without pods are present with an empty dict.
+
+With --output ndjson|csv|parquet the nested report is not built at all:
+every container becomes one flat record (namespace, pod, container and a
+boolean per checked field) that is written as soon as its page arrives,
+so output memory stays constant. Parquet needs pyarrow and a file.
+
+Pods come from the first available source:
+- a recorded snapshot (--snapshot, see k8s_snapshot)
+- the Kubernetes API via the python client
+- `kubectl get pods -A -o json` if the kubernetes package is not installed
+  (or --kubectl is given): one process instead of one per namespace. Its
+  output is decoded incrementally, one pod at a time (see k8s_jsonstream)
+
+Service accounts that may not list pods cluster-wide can use
+--per-namespace (or -n): namespaces are listed by a bounded worker pool
+(--concurrency) with a per-request --timeout, so the run takes about as
+long as its slowest few namespaces. Progress shows a throughput-based ETA.
+
+Usage examples:
+  python3 k8s_audit.py
+  python3 k8s_audit.py --audit probes
+  python3 k8s_audit.py --snapshot ./incident-dump/
+  python3 k8s_audit.py --per-namespace --concurrency 16 --timeout 20
+  python3 k8s_audit.py -n team-a -n team-b
+  python3 k8s_audit.py --output ndjson > audit.ndjson
+  python3 k8s_audit.py --output parquet --output-file audit.parquet
+"""
+
+import argparse
+import csv
+import json
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from k8s_jsonstream import iter_list_items, iter_stream_chunks
+from k8s_snapshot import Snapshot
+
+try:
+    from kubernetes import client, config
+    from kubernetes.config.config_exception import ConfigException
+
+    from k8s_raw import iter_pages_raw, list_raw
+except ImportError:
+    client = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT_SECONDS = 30.0
+OUTPUTS = ("text", "ndjson", "csv", "parquet")
+SOURCE_PAGE_SIZE = 500
+PARQUET_ROW_GROUP_SIZE = 65536
+
+
+def execute_kube_command_json(command, timeout=None):
+    # Yields the "items" of the List a kubectl command prints. stdout is
+    # decoded chunk by chunk, so only the current item is held in memory;
+    # stderr goes to a temporary file so a chatty kubectl cannot block on
+    # a full pipe. A non-zero exit still raises RuntimeError, after the
+    # items read so far.
+    # Split command safely instead of using shell=True
+    command_parts = shlex.split(command)
+    with tempfile.TemporaryFile() as stderr:
+        kube_command = subprocess.Popen(command_parts, stdout=subprocess.PIPE, stderr=stderr, shell=False)
+        timed_out = threading.Event()
+
+        def expire():
+            timed_out.set()
+            kube_command.kill()
+
+        timer = threading.Timer(timeout, expire) if timeout else None
+        if timer is not None:
+            timer.start()
+        try:
+            try:
+                yield from iter_list_items(iter_stream_chunks(kube_command.stdout))
+            except ValueError:
+                # Truncated or empty output; report the exit status instead
+                # if kubectl failed.
+                if kube_command.wait() == 0 and not timed_out.is_set():
+                    raise
+            returncode = kube_command.wait()
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(command_parts, timeout)
+            if returncode != 0:
+                stderr.seek(0)
+                raise RuntimeError(f"Command failed: {command}\nError: {stderr.read().decode('utf-8')}")
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if kube_command.poll() is None:
+                kube_command.kill()
+                kube_command.wait()
+            kube_command.stdout.close()
+
+
+def probe_status(container: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        "livenessProbe": "present" if "livenessProbe" in container else "not present",
+        "readinessProbe": "present" if "readinessProbe" in container else "not present",
+    }
+
+
+def resource_status(container: Dict[str, Any]) -> Dict[str, str]:
+    resources = container.get("resources") or {}
+    return {
+        "requests": "present" if "requests" in resources else "not present",
+        "limits": "present" if "limits" in resources else "not present",
+    }
+
+
+AUDITORS: Dict[str, Callable[[Dict[str, Any]], Dict[str, str]]] = {
+    "probes": probe_status,
+    "resources": resource_status,
+}
+
+# Fields each auditor adds to a flat record, in column order.
+AUDIT_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "probes": ("livenessProbe", "readinessProbe"),
+    "resources": ("requests", "limits"),
+}
+RECORD_KEYS = ("namespace", "pod", "container")
+
+
+class Page(NamedTuple):
+    # A batch of pods plus progress in the source's own unit: pods for the
+    # cluster-wide list, namespaces for the per-namespace fan-out. total is
+    # None when unknown.
+    pods: List[Dict[str, Any]]
+    done: int
+    total: Optional[int]
+    unit: str
+
+
+# A source returns (namespace names, iterator of pages); pages let the
+# engine report progress while the list is still streaming.
+Pages = Iterator[Page]
+
+
+class ThroughputEstimator:
+    # Exponentially weighted moving average of units per second. The ETA is
+    # remaining / rate, which (unlike extrapolating from the last item)
+    # stays stable when items vary in size or finish out of order.
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.rate: Optional[float] = None
+        self._last_time = time.monotonic()
+        self._last_done = 0
+
+    def update(self, done: int) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        if elapsed <= 0 or done <= self._last_done:
+            return
+        rate = (done - self._last_done) / elapsed
+        self.rate = rate if self.rate is None else self.alpha * rate + (1 - self.alpha) * self.rate
+        self._last_time = now
+        self._last_done = done
+
+    def eta(self, done: int, total: Optional[int]) -> Optional[float]:
+        if total is None or not self.rate:
+            return None
+        return max(total - done, 0) / self.rate
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def load_api_client(pool_size: Optional[int] = None):
+    try:
+        config.load_incluster_config()
+    except ConfigException:
+        config.load_kube_config()
+    configuration = client.Configuration.get_default_copy()
+    if pool_size:
+        # One pooled connection per worker, so the fan-out does not queue on
+        # urllib3's default pool.
+        configuration.connection_pool_maxsize = max(configuration.connection_pool_maxsize, pool_size)
+    return client.ApiClient(configuration)
+
+
+def api_source(api_client) -> Tuple[List[str], Pages]:
+    v1 = client.CoreV1Api(api_client)
+    namespaces = [ns["metadata"]["name"] for ns in list_raw(v1.list_namespace).get("items") or []]
+
+    def pages() -> Pages:
+        processed = 0
+        for page in iter_pages_raw(v1.list_pod_for_all_namespaces):
+            items = page.get("items") or []
+            processed += len(items)
+            remaining = page["metadata"].get("remainingItemCount")
+            yield Page(items, processed, processed + remaining if remaining is not None else None, "pods")
+
+    return namespaces, pages()
+
+
+def _paged(pods: Iterable[Dict[str, Any]], page_size: int = SOURCE_PAGE_SIZE) -> Pages:
+    page: List[Dict[str, Any]] = []
+    processed = 0
+    for pod in pods:
+        page.append(pod)
+        if len(page) == page_size:
+            processed += len(page)
+            yield Page(page, processed, None, "pods")
+            page = []
+    if page:
+        yield Page(page, processed + len(page), None, "pods")
+
+
+def kubectl_source() -> Tuple[List[str], Pages]:
+    namespaces = [ns["metadata"]["name"] for ns in execute_kube_command_json("kubectl get namespaces -o json")]
+    return namespaces, _paged(execute_kube_command_json("kubectl get pods --all-namespaces -o json"))
+
+
+def snapshot_source(snapshot: Snapshot, page_size: int = SOURCE_PAGE_SIZE) -> Tuple[List[str], Pages]:
+    namespaces = [ns["metadata"]["name"] for ns in snapshot.namespaces()]
+    return namespaces, _paged(snapshot.pods(), page_size)
+
+
+def per_namespace_source(
+    list_namespace_pods: Callable[[str], List[Dict[str, Any]]],
+    namespaces: List[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Tuple[List[str], Pages]:
+    # Namespaces are listed by at most `concurrency` workers and yielded in
+    # completion order. A namespace that fails (403, timeout) is reported on
+    # stderr and keeps its empty entry instead of aborting the audit.
+
+    def pages() -> Pages:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {pool.submit(list_namespace_pods, ns): ns for ns in namespaces}
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    items = future.result()
+                except Exception as exc:
+                    print(f"Skipped namespace {futures[future]}: {exc}", file=sys.stderr)
+                    items = []
+                yield Page(items, done, len(namespaces), "namespaces")
+
+    return namespaces, pages()
+
+
+def api_namespace_lister(api_client, timeout: float) -> Callable[[str], List[Dict[str, Any]]]:
+    v1 = client.CoreV1Api(api_client)
+
+    def list_namespace_pods(namespace: str) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        for page in iter_pages_raw(v1.list_namespaced_pod, namespace=namespace, _request_timeout=timeout):
+            items.extend(page.get("items") or [])
+        return items
+
+    return list_namespace_pods
+
+
+def kubectl_namespace_lister(timeout: float) -> Callable[[str], List[Dict[str, Any]]]:
+    def list_namespace_pods(namespace: str) -> List[Dict[str, Any]]:
+        command = f"kubectl get pods -n {shlex.quote(namespace)} -o json --request-timeout={int(timeout)}s"
+        return list(execute_kube_command_json(command, timeout=timeout))
+
+    return list_namespace_pods
+
+
+def _print_progress(estimator: ThroughputEstimator, page: Page, out: TextIO) -> None:
+    estimator.update(page.done)
+    of_total = f" of {page.total}" if page.total is not None else ""
+    eta = estimator.eta(page.done, page.total)
+    left = f", about {format_duration(eta)} left" if eta is not None and page.done < page.total else ""
+    print(f"Processed {page.done}{of_total} {page.unit}{left}", file=out)
+
+
+def run_audit(
+    auditors: Dict[str, Callable[[Dict[str, Any]], Dict[str, str]]],
+    namespaces: List[str],
+    pages: Pages,
+    progress: bool = True,
+) -> Dict[str, Dict[str, Dict[str, Dict[str, Dict[str, str]]]]]:
+    reports: Dict[str, Dict] = {name: {ns: {} for ns in namespaces} for name in auditors}
+    estimator = ThroughputEstimator()
+    for page in pages:
+        for pod in page.pods:
+            ns = pod["metadata"]["namespace"]
+            pod_name = pod["metadata"]["name"]
+            containers = pod["spec"]["containers"]
+            for name, audit in auditors.items():
+                reports[name].setdefault(ns, {})[pod_name] = {c["name"]: audit(c) for c in containers}
+        if progress:
+            _print_progress(estimator, page, sys.stdout)
+    return reports
+
+
+def record_columns(auditors: Iterable[str]) -> List[str]:
+    return list(RECORD_KEYS) + [field for name in auditors for field in AUDIT_FIELDS[name]]
+
+
+def iter_audit_records(
+    auditors: Dict[str, Callable[[Dict[str, Any]], Dict[str, str]]],
+    pages: Pages,
+    progress: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    # One flat record per container; "present" becomes True. Progress goes
+    # to stderr because the records may be going to stdout.
+    estimator = ThroughputEstimator()
+    for page in pages:
+        for pod in page.pods:
+            ns = pod["metadata"]["namespace"]
+            pod_name = pod["metadata"]["name"]
+            for container in pod["spec"]["containers"]:
+                record: Dict[str, Any] = {"namespace": ns, "pod": pod_name, "container": container["name"]}
+                for audit in auditors.values():
+                    for field, status in audit(container).items():
+                        record[field] = status == "present"
+                yield record
+        if progress:
+            _print_progress(estimator, page, sys.stderr)
+
+
+class NdjsonRecordWriter:
+    def __init__(self, out: TextIO, columns: List[str]):
+        self.out = out
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.out.write(json.dumps(record, separators=(",", ":")))
+        self.out.write("\n")
+
+    def close(self) -> None:
+        self.out.flush()
+
+
+class CsvRecordWriter:
+    def __init__(self, out: TextIO, columns: List[str]):
+        self.out = out
+        self._writer = csv.DictWriter(out, fieldnames=columns)
+        self._writer.writeheader()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._writer.writerow(record)
+
+    def close(self) -> None:
+        self.out.flush()
+
+
+class ParquetRecordWriter:
+    # Buffers one row group of column lists at a time, so memory is bounded
+    # by PARQUET_ROW_GROUP_SIZE rows however large the cluster is. String
+    # columns are dictionary-encoded by parquet, which keeps the repeated
+    # namespace and pod names small.
+
+    def __init__(self, path: str, columns: List[str]):
+        self.columns = columns
+        self.schema = pyarrow.schema(
+            [(c, pyarrow.string()) for c in RECORD_KEYS] + [(c, pyarrow.bool_()) for c in columns[len(RECORD_KEYS):]]
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression="zstd")
+        self._buffer: Dict[str, List[Any]] = {c: [] for c in columns}
+        self._rows = 0
+
+    def write(self, record: Dict[str, Any]) -> None:
+        for c in self.columns:
+            self._buffer[c].append(record[c])
+        self._rows += 1
+        if self._rows == PARQUET_ROW_GROUP_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._rows:
+            self._writer.write_table(pyarrow.Table.from_pydict(self._buffer, schema=self.schema))
+            self._buffer = {c: [] for c in self.columns}
+            self._rows = 0
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+RECORD_WRITERS = {
+    "ndjson": NdjsonRecordWriter,
+    "csv": CsvRecordWriter,
+    "parquet": ParquetRecordWriter,
+}
+
+
+def write_audit(
+    args: argparse.Namespace,
+    auditors: Dict[str, Callable[[Dict[str, Any]], Dict[str, str]]],
+    pages: Pages,
+) -> int:
+    columns = record_columns(auditors)
+    out: Optional[TextIO] = None
+    if args.output == "parquet":
+        writer = ParquetRecordWriter(args.output_file, columns)
+    else:
+        out = open(args.output_file, "w", newline="", encoding="utf-8") if args.output_file else sys.stdout
+        writer = RECORD_WRITERS[args.output](out, columns)
+
+    written = 0
+    try:
+        for record in iter_audit_records(auditors, pages):
+            writer.write(record)
+            written += 1
+    finally:
+        writer.close()
+        if out is not None and out is not sys.stdout:
+            out.close()
+    return written
+
+
+def open_source(args: argparse.Namespace) -> Tuple[List[str], Pages]:
+    if args.snapshot:
+        return snapshot_source(Snapshot(args.snapshot))
+
+    use_kubectl = args.kubectl or client is None
+    if not (args.per_namespace or args.namespaces):
+        return kubectl_source() if use_kubectl else api_source(load_api_client())
+
+    if use_kubectl:
+        lister = kubectl_namespace_lister(args.timeout)
+        namespaces = args.namespaces or [
+            ns["metadata"]["name"]
+            for ns in execute_kube_command_json("kubectl get namespaces -o json", timeout=args.timeout)
+        ]
+    else:
+        api_client = load_api_client(args.concurrency)
+        lister = api_namespace_lister(api_client, args.timeout)
+        namespaces = args.namespaces or [
+            ns["metadata"]["name"]
+            for ns in list_raw(client.CoreV1Api(api_client).list_namespace, _request_timeout=args.timeout).get("items")
+            or []
+        ]
+    return per_namespace_source(lister, namespaces, args.concurrency)
+
+
+def add_source_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--snapshot", metavar="PATH", help="Audit a recorded snapshot (see k8s_snapshot) instead of the live cluster"
+    )
+    parser.add_argument(
+        "--kubectl", action="store_true", help="List pods through kubectl instead of the python client"
+    )
+    parser.add_argument(
+        "--per-namespace",
+        action="store_true",
+        help="List pods namespace by namespace (for RBAC scoped to namespaces)",
+    )
+    parser.add_argument(
+        "-n",
+        "--namespace",
+        action="append",
+        dest="namespaces",
+        help="Only audit this namespace (repeatable, implies --per-namespace)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Namespaces listed in parallel with --per-namespace (default: {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT_SECONDS,
+        help=f"Per-request timeout in seconds with --per-namespace (default: {DEFAULT_TIMEOUT_SECONDS:g})",
+    )
+
+
+def add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--output",
+        choices=OUTPUTS,
+        default="text",
+        help="text prints the nested report; the others stream one record per container",
+    )
+    parser.add_argument("--output-file", metavar="PATH", help="Write records to PATH instead of stdout")
+
+
+def check_source_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.timeout <= 0:
+        parser.error("--timeout must be a positive number of seconds")
+    if getattr(args, "output", "text") == "parquet":
+        if pyarrow is None:
+            parser.error("--output parquet needs pyarrow (pip install pyarrow)")
+        if not args.output_file:
+            parser.error("--output parquet needs --output-file")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Audit probes and resource requests/limits in one pass")
+    parser.add_argument(
+        "--audit",
+        default=",".join(AUDITORS),
+        help=f"Comma-separated auditors to run (default: {','.join(AUDITORS)})",
+    )
+    add_source_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    check_source_arguments(parser, args)
+
+    selected = [a.strip() for a in args.audit.split(",") if a.strip()]
+    unknown = [a for a in selected if a not in AUDITORS]
+    if unknown:
+        parser.error(f"unknown auditor(s): {', '.join(unknown)}; valid: {', '.join(AUDITORS)}")
+
+    auditors = {name: AUDITORS[name] for name in selected}
+    try:
+        namespaces, pages = open_source(args)
+        if args.output != "text":
+            write_audit(args, auditors, pages)
+            return
+        reports = run_audit(auditors, namespaces, pages)
+    except Exception as exc:
+        print(f"Audit failed: {exc}", file=sys.stderr)
+        sys.exit(1)
+    for name in selected:
+        print(reports[name])
+
+
+if __name__ == "__main__":
+    main()
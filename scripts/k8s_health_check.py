@@ -5,24 +5,68 @@ Simple Kubernetes health check script.
 
 Features:
 - Auto-detects config.
-- Lets the user scan all namespaces or a specific namespace.
+- Lets the user scan all namespaces or a specific namespace, interactively
+  or via --all-namespaces / --namespace (repeatable).
 - Checks:
   * Pod status issues
   * Containers running as root
   * Missing liveness/readiness probes
   * Pods missing resource requests/limits
   * Node condition problems
+  * Node CPU/memory commitment (requests and limits vs allocatable)
+  * Node headroom ranking and free-capacity fragmentation (INFO)
+  Node commitment and headroom need every pod on a node, so they only run
+  when all namespaces are scanned.
   * Recent warning Events for failures
+- Checks are registered rules (see `rule`) evaluated in a single pass over
+  pods and their containers; findings are collected and printed afterwards.
+- Checks that only look at the pod template (root, probes, resources) run
+  once per owning workload and report a replica count (--per-pod to
+  report every pod instead).
+- Events are filtered server-side (Warning plus known failure reasons),
+  read from events.k8s.io/v1 when available and aggregated per reason and
+  involved object. With --state-file, repeated runs only report events
+  newer than the previous run.
+- --snapshot runs the same checks offline against a recorded dump.
+- --baseline DB keeps finding fingerprints in SQLite and reports only what
+  is new or resolved since the previous run; FAIL exit only on new FAILs.
+- Machine-readable output (--output ndjson|junit|sarif) streams findings as
+  they are produced. The exit code is 1 if any FAIL finding was reported.
+
+Usage examples:
+  python3 k8s_health_check.py
+  python3 k8s_health_check.py -A --output ndjson
+  python3 k8s_health_check.py -n prod -n staging --checks pod-status,missing-probes --output junit > report.xml
+  python3 k8s_health_check.py -A --output ndjson --state-file /var/tmp/k8s_health_events.json
+  python3 k8s_health_check.py -A --snapshot ./incident-dump/
+  python3 k8s_health_check.py -A --baseline ~/.k8s_health_baseline.db
+  python3 k8s_health_check.py --list-checks
 
 """
 
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import re
+import sqlite3
 import sys
 import datetime
-from typing import List, Optional, Tuple
+from dataclasses import asdict, dataclass
+from itertools import chain
+from xml.sax.saxutils import quoteattr
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple, Union
 
 from kubernetes import client, config
+from kubernetes.client import ApiException
 from kubernetes.config.config_exception import ConfigException
 
+from k8s_audit import NdjsonRecordWriter
+from k8s_quantity import milli_value
+from k8s_raw import METADATA_ONLY_HEADERS, list_raw, paginate_raw, parse_time
+from k8s_snapshot import Snapshot
+
 try:
     from colorama import Fore, Style, init as colorama_init
 
@@ -59,30 +103,105 @@ def get_core_v1_api() -> client.CoreV1Api:
     return client.CoreV1Api()
 
 
-def list_namespaces(v1: client.CoreV1Api) -> List[str]:
-    ns_list = v1.list_namespace()
-    return [ns.metadata.name for ns in ns_list.items]
+# The fetch functions take either a live CoreV1Api or an offline Snapshot
+# (see k8s_snapshot); both yield the same plain dicts.
+Source = Union[client.CoreV1Api, Snapshot]
 
 
-def get_pods(v1: client.CoreV1Api, namespace: Optional[str]) -> List[client.V1Pod]:
-    if namespace is None:
-        pods = v1.list_pod_for_all_namespaces()
-    else:
-        pods = v1.list_namespaced_pod(namespace=namespace)
-    return pods.items
+def list_namespaces(v1: Source) -> List[str]:
+    if isinstance(v1, Snapshot):
+        return [ns["metadata"]["name"] for ns in v1.namespaces()]
+    ns_list = list_raw(v1.list_namespace)
+    return [ns["metadata"]["name"] for ns in ns_list.get("items") or []]
 
 
-def get_nodes(v1: client.CoreV1Api) -> List[client.V1Node]:
-    nodes = v1.list_node()
-    return nodes.items
+# Objects are plain dicts decoded from the raw API response (see k8s_raw),
+# streamed page by page so memory is bounded by the page size and checks
+# start before the last page is downloaded.
 
 
-def get_events(v1: client.CoreV1Api, namespace: Optional[str]) -> List[client.CoreV1Event]:
+def get_pods(v1: Source, namespace: Optional[str]) -> Iterator[Dict[str, Any]]:
+    if isinstance(v1, Snapshot):
+        return v1.pods(namespace)
     if namespace is None:
-        ev = v1.list_event_for_all_namespaces()
-    else:
-        ev = v1.list_namespaced_event(namespace=namespace)
-    return ev.items
+        return paginate_raw(v1.list_pod_for_all_namespaces)
+    return paginate_raw(v1.list_namespaced_pod, namespace=namespace)
+
+
+def get_nodes(v1: Source) -> Iterator[Dict[str, Any]]:
+    if isinstance(v1, Snapshot):
+        return v1.nodes()
+    return paginate_raw(v1.list_node)
+
+
+def _core_event(ev: Dict[str, Any]) -> Dict[str, Any]:
+    # events.k8s.io/v1 renames a few core/v1 Event fields; map them back so
+    # the rules only deal with one shape.
+    series = ev.get("series") or {}
+    return {
+        "metadata": ev.get("metadata") or {},
+        "involvedObject": ev.get("regarding") or {},
+        "reason": ev.get("reason"),
+        "message": ev.get("note"),
+        "type": ev.get("type"),
+        "eventTime": ev.get("eventTime"),
+        "firstTimestamp": ev.get("deprecatedFirstTimestamp"),
+        "lastTimestamp": ev.get("deprecatedLastTimestamp"),
+        "series": series,
+        "count": series.get("count") or ev.get("deprecatedCount") or 1,
+    }
+
+
+def event_field_selectors() -> List[str]:
+    # Only Warning events and the non-Warning events whose reason is in
+    # EVENT_FAIL_REASONS can produce findings (check_recent_events matches
+    # other "Failed*" reasons on Warning events only), so let the API
+    # server drop the rest. Field selectors cannot OR values, hence one
+    # per reason.
+    return ["type=Warning"] + [f"type!=Warning,reason={reason}" for reason in sorted(EVENT_FAIL_REASONS)]
+
+
+def get_events(v1: Source, namespace: Optional[str]) -> Iterator[Dict[str, Any]]:
+    if isinstance(v1, Snapshot):
+        # Apply the same filter as the field selectors.
+        for ev in v1.events(namespace):
+            if "regarding" in ev:
+                ev = _core_event(ev)
+            if ev.get("type") == "Warning" or ev.get("reason") in EVENT_FAIL_REASONS:
+                yield ev
+        return
+
+    events_v1: Optional[client.EventsV1Api] = client.EventsV1Api(v1.api_client)
+    for selector in event_field_selectors():
+        if events_v1 is not None:
+            try:
+                if namespace is None:
+                    items = paginate_raw(events_v1.list_event_for_all_namespaces, field_selector=selector)
+                else:
+                    items = paginate_raw(events_v1.list_namespaced_event, namespace=namespace, field_selector=selector)
+                for ev in items:
+                    yield _core_event(ev)
+                continue
+            except ApiException as exc:
+                # Clusters without events.k8s.io/v1 (before 1.19) return 404,
+                # and RBAC that grants core "events" but not the
+                # events.k8s.io group returns 403. Both fail on the first
+                # page, before anything was yielded.
+                if exc.status not in (403, 404):
+                    raise
+                events_v1 = None
+
+        if namespace is None:
+            yield from paginate_raw(v1.list_event_for_all_namespaces, field_selector=selector)
+        else:
+            yield from paginate_raw(v1.list_namespaced_event, namespace=namespace, field_selector=selector)
+
+
+def counted(items: Iterable, counts: Dict[str, int], key: str) -> Iterator:
+    counts.setdefault(key, 0)
+    for item in items:
+        counts[key] += 1
+        yield item
 
 
 def print_header(title: str) -> None:
@@ -103,259 +222,899 @@ def print_result(severity: str, message: str) -> None:
     print(f"{color}[{sev}]{COLOR_RESET} {message}")
 
 
-def check_pod_status_issues(pods: List[client.V1Pod]) -> bool:
-    print_header("Pod Status Issues")
-    fail_found = False
-    issues_found = False
-
-    RESTART_THRESHOLD = 5
-
-    for pod in pods:
-        ns = pod.metadata.namespace
-        name = pod.metadata.name
-        phase = (pod.status.phase or "Unknown").upper()
-
-        if phase in ("FAILED", "UNKNOWN"):
-            issues_found = True
-            fail_found = True
-            print_result("FAIL", f"Pod {ns}/{name} is in phase {phase}.")
-
-        cstatus_list = pod.status.container_statuses or []
-        for cstatus in cstatus_list:
-            cname = cstatus.name
-
-            state = cstatus.state
-            if state and state.waiting:
-                reason = state.waiting.reason or ""
-                reason_upper = reason.upper()
-                if reason_upper in ("CRASHLOOPBACKOFF", "IMAGEPULLBACKOFF"):
-                    issues_found = True
-                    fail_found = True
-                    print_result(
-                        "FAIL", f"Container {ns}/{name}:{cname} in state {reason} " f"({state.waiting.message or ''})"
-                    )
-
-            restarts = cstatus.restart_count or 0
-            if restarts > RESTART_THRESHOLD:
-                issues_found = True
-                print_result(
-                    "WARN",
-                    f"Container {ns}/{name}:{cname} has restarted {restarts} times "
-                    f"(threshold {RESTART_THRESHOLD}).",
-                )
-
-    if not issues_found:
-        print_result("OK", "No problematic pod statuses found.")
-    return fail_found
-
+@dataclass
+class Finding:
+    rule_id: str
+    severity: str
+    message: str
+    kind: str
+    namespace: Optional[str] = None
+    name: Optional[str] = None
+    uid: Optional[str] = None
+    # Pod template hash for findings reported once per workload template.
+    template: Optional[str] = None
+    # "new" or "resolved" when diffing against a baseline (see BaselineStore).
+    change: Optional[str] = None
+
+
+@dataclass
+class Rule:
+    id: str
+    title: str
+    scope: str
+    severity: str
+    ok_message: str
+    check: Callable[..., Iterable[Tuple[str, str]]]
+    template: bool = False
+
+
+# Rules are visitors: "pod" rules get each pod, "container" rules get each
+# (pod, container) pair, "node" and "event" rules get each node / event.
+# "capacity" rules get each (node, NodeCommitment) with the requests and
+# limits of the pods scheduled on it, summed during the same pod pass, and
+# "cluster" rules get one {"metadata": {}, "nodes": [NodeCommitment, ...]}.
+# They yield (severity, message) tuples and are run in registration order.
+# Container rules marked template=True only look at the pod spec, so
+# evaluate() runs them once per owning workload instead of once per replica.
+RULES: List[Rule] = []
+RULE_SCOPES = ("pod", "container", "node", "capacity", "cluster", "event")
+# Scopes that sum every pod on a node; partial namespaces would misjudge them.
+NODE_TOTAL_SCOPES = ("capacity", "cluster")
+
+
+def rule(rule_id: str, title: str, scope: str, severity: str, ok_message: str, template: bool = False):
+    if scope not in RULE_SCOPES:
+        raise ValueError(f"Unknown rule scope {scope!r}")
+
+    def register(func):
+        RULES.append(Rule(rule_id, title, scope, severity, ok_message, func, template))
+        return func
+
+    return register
+
+
+RESTART_THRESHOLD = 5
+
+
+@rule("pod-status", "Pod Status Issues", "pod", "FAIL", "No problematic pod statuses found.")
+def check_pod_status_issues(pod: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    ns = pod["metadata"].get("namespace")
+    name = pod["metadata"]["name"]
+    status = pod.get("status") or {}
+    phase = (status.get("phase") or "Unknown").upper()
+
+    if phase in ("FAILED", "UNKNOWN"):
+        yield "FAIL", f"Pod {ns}/{name} is in phase {phase}."
+
+    cstatus_list = status.get("containerStatuses") or []
+    for cstatus in cstatus_list:
+        cname = cstatus.get("name")
+
+        waiting = (cstatus.get("state") or {}).get("waiting")
+        if waiting:
+            reason = waiting.get("reason") or ""
+            reason_upper = reason.upper()
+            if reason_upper in ("CRASHLOOPBACKOFF", "IMAGEPULLBACKOFF"):
+                yield "FAIL", f"Container {ns}/{name}:{cname} in state {reason} " f"({waiting.get('message') or ''})"
+
+        restarts = cstatus.get("restartCount") or 0
+        if restarts > RESTART_THRESHOLD:
+            yield (
+                "WARN",
+                f"Container {ns}/{name}:{cname} has restarted {restarts} times " f"(threshold {RESTART_THRESHOLD}).",
+            )
+
+
+@rule(
+    "run-as-root",
+    "Containers Running as Root",
+    "container",
+    "WARN",
+    "No containers found that obviously run as root or lack runAsUser.",
+    template=True,
+)
+def check_containers_running_as_root(pod: Dict[str, Any], container: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    ns = pod["metadata"].get("namespace")
+    name = pod["metadata"]["name"]
+    cname = container["name"]
+    pod_sc = pod["spec"].get("securityContext") or {}
+    pod_run_as_user = pod_sc.get("runAsUser")
+
+    csc = container.get("securityContext") or {}
+    c_run_as_user = csc.get("runAsUser")
+
+    effective_run_as_user = c_run_as_user
+    if effective_run_as_user is None:
+        effective_run_as_user = pod_run_as_user
+
+    if effective_run_as_user == 0:
+        yield "WARN", f"Container {ns}/{name}:{cname} is explicitly running as root (runAsUser=0)."
+    elif effective_run_as_user is None:
+        yield (
+            "WARN",
+            f"Container {ns}/{name}:{cname} has no runAsUser set " f"(may default to root depending on image).",
+        )
 
-def check_containers_running_as_root(pods: List[client.V1Pod]) -> bool:
-    print_header("Containers Running as Root")
-    fail_found = False
-    issues_found = False
 
-    for pod in pods:
-        ns = pod.metadata.namespace
-        name = pod.metadata.name
-        pod_sc = pod.spec.security_context
+@rule(
+    "missing-probes",
+    "Missing Liveness / Readiness Probes",
+    "container",
+    "WARN",
+    "All containers have both liveness and readiness probes.",
+    template=True,
+)
+def check_missing_probes(pod: Dict[str, Any], container: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    has_liveness = container.get("livenessProbe") is not None
+    has_readiness = container.get("readinessProbe") is not None
+
+    if not has_liveness or not has_readiness:
+        missing = []
+        if not has_liveness:
+            missing.append("liveness")
+        if not has_readiness:
+            missing.append("readiness")
+        missing_str = " and ".join(missing)
+        yield (
+            "WARN",
+            f"Container {pod['metadata'].get('namespace')}/{pod['metadata']['name']}:{container['name']} "
+            f"is missing {missing_str} probe(s).",
+        )
 
-        pod_run_as_user = getattr(pod_sc, "run_as_user", None) if pod_sc else None
 
-        for container in pod.spec.containers or []:
-            csc = container.security_context
-            c_run_as_user = getattr(csc, "run_as_user", None) if csc else None
+@rule(
+    "missing-resources",
+    "Resource Requests / Limits",
+    "container",
+    "WARN",
+    "All containers have resource requests and limits defined.",
+    template=True,
+)
+def check_pods_resource_requests_limits(
+    pod: Dict[str, Any], container: Dict[str, Any]
+) -> Iterator[Tuple[str, str]]:
+    res = container.get("resources") or {}
+    requests = res.get("requests")
+    limits = res.get("limits")
+
+    if not requests or not limits:
+        missing = []
+        if not requests:
+            missing.append("requests")
+        if not limits:
+            missing.append("limits")
+        missing_str = " and ".join(missing)
+        yield (
+            "WARN",
+            f"Container {pod['metadata'].get('namespace')}/{pod['metadata']['name']}:{container['name']} "
+            f"has missing resource {missing_str}.",
+        )
 
-            effective_run_as_user = c_run_as_user
-            if effective_run_as_user is None:
-                effective_run_as_user = pod_run_as_user
 
-            if effective_run_as_user == 0:
-                issues_found = True
-                print_result(
-                    "WARN", f"Container {ns}/{name}:{container.name} is explicitly running as root (runAsUser=0)."
-                )
-            elif effective_run_as_user is None:
-                issues_found = True
-                print_result(
-                    "WARN",
-                    f"Container {ns}/{name}:{container.name} has no runAsUser set "
-                    f"(may default to root depending on image).",
+@rule(
+    "node-conditions",
+    "Node Conditions",
+    "node",
+    "FAIL",
+    "All nodes are Ready with no DiskPressure or MemoryPressure.",
+)
+def check_node_conditions(node: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    name = node["metadata"]["name"]
+    conds = (node.get("status") or {}).get("conditions") or []
+
+    ready_status = None
+
+    for cond in conds:
+        ctype = cond.get("type")
+        cstatus = cond.get("status")
+        reason = cond.get("reason")
+        message = cond.get("message")
+        if ctype == "Ready":
+            ready_status = cstatus
+            if cstatus != "True":
+                yield (
+                    "FAIL",
+                    f"Node {name} is NotReady (status={cstatus}, reason={reason}, message={message}).",
                 )
+        elif ctype == "DiskPressure":
+            if cstatus == "True":
+                yield "FAIL", f"Node {name} has DiskPressure (reason={reason}, message={message})."
+        elif ctype == "MemoryPressure":
+            if cstatus == "True":
+                yield "FAIL", f"Node {name} has MemoryPressure (reason={reason}, message={message})."
+
+    if ready_status is None:
+        yield "FAIL", f"Node {name} has no Ready condition reported."
+
+
+@dataclass
+class NodeCommitment:
+    # CPU in millicores, memory in milli-bytes (k8s_quantity milli-units),
+    # so every comparison is exact integer arithmetic.
+    name: str
+    cpu_allocatable: int
+    memory_allocatable: int
+    cpu_requests: int = 0
+    cpu_limits: int = 0
+    memory_requests: int = 0
+    memory_limits: int = 0
+    pods: int = 0
+
+    @property
+    def cpu_request_ratio(self) -> float:
+        return self.cpu_requests / self.cpu_allocatable if self.cpu_allocatable else 0.0
+
+    @property
+    def memory_request_ratio(self) -> float:
+        return self.memory_requests / self.memory_allocatable if self.memory_allocatable else 0.0
+
+    @property
+    def cpu_free(self) -> int:
+        return max(self.cpu_allocatable - self.cpu_requests, 0)
+
+    @property
+    def memory_free(self) -> int:
+        return max(self.memory_allocatable - self.memory_requests, 0)
+
+
+# Index order of the per-pod and per-node resource vectors.
+CPU_REQUESTS, CPU_LIMITS, MEMORY_REQUESTS, MEMORY_LIMITS = range(4)
+
+
+def _resource_vector(container: Dict[str, Any]) -> List[int]:
+    res = container.get("resources") or {}
+    requests = res.get("requests") or {}
+    limits = res.get("limits") or {}
+    return [
+        milli_value(requests.get("cpu")),
+        milli_value(limits.get("cpu")),
+        milli_value(requests.get("memory")),
+        milli_value(limits.get("memory")),
+    ]
+
+
+def pod_resource_vector(pod: Dict[str, Any]) -> List[int]:
+    # Effective pod resources as the scheduler sees them: app containers and
+    # sidecars (init containers with restartPolicy Always) add up, regular
+    # init containers only need to fit on top of the sidecars started before
+    # them, and pod overhead is added on top.
+    spec = pod["spec"]
+    app = [0, 0, 0, 0]
+    for container in spec.get("containers") or []:
+        app = [a + b for a, b in zip(app, _resource_vector(container))]
+
+    sidecars = [0, 0, 0, 0]
+    init_peak = [0, 0, 0, 0]
+    for container in spec.get("initContainers") or []:
+        vector = _resource_vector(container)
+        if container.get("restartPolicy") == "Always":
+            sidecars = [a + b for a, b in zip(sidecars, vector)]
+            init_peak = [max(p, s) for p, s in zip(init_peak, sidecars)]
+        else:
+            init_peak = [max(p, v + s) for p, v, s in zip(init_peak, vector, sidecars)]
 
-    if not issues_found:
-        print_result("OK", "No containers found that obviously run as root or lack runAsUser.")
-    return fail_found
+    total = [max(a + s, p) for a, s, p in zip(app, sidecars, init_peak)]
+    overhead = spec.get("overhead") or {}
+    if overhead:
+        cpu, memory = milli_value(overhead.get("cpu")), milli_value(overhead.get("memory"))
+        total = [total[0] + cpu, total[1] + cpu, total[2] + memory, total[3] + memory]
+    return total
 
 
-def check_missing_probes(pods: List[client.V1Pod]) -> bool:
-    print_header("Missing Liveness / Readiness Probes")
-    fail_found = False
-    issues_found = False
-
-    for pod in pods:
-        ns = pod.metadata.namespace
-        name = pod.metadata.name
-
-        for container in pod.spec.containers or []:
-            cname = container.name
-            has_liveness = container.liveness_probe is not None
-            has_readiness = container.readiness_probe is not None
-
-            if not has_liveness or not has_readiness:
-                issues_found = True
-                missing = []
-                if not has_liveness:
-                    missing.append("liveness")
-                if not has_readiness:
-                    missing.append("readiness")
-                missing_str = " and ".join(missing)
-                print_result("WARN", f"Container {ns}/{name}:{cname} is missing {missing_str} probe(s).")
-
-    if not issues_found:
-        print_result("OK", "All containers have both liveness and readiness probes.")
-    return fail_found
+def _cores(milli: int) -> str:
+    return f"{milli / 1000:.2f}"
 
 
-def check_pods_resource_requests_limits(pods: List[client.V1Pod]) -> bool:
-    print_header("Resource Requests / Limits")
-    fail_found = False
-    issues_found = False
-
-    for pod in pods:
-        ns = pod.metadata.namespace
-        name = pod.metadata.name
-
-        for container in pod.spec.containers or []:
-            cname = container.name
-            res = container.resources
-
-            requests = getattr(res, "requests", None) if res else None
-            limits = getattr(res, "limits", None) if res else None
-
-            if not requests or not limits:
-                issues_found = True
-                missing = []
-                if not requests:
-                    missing.append("requests")
-                if not limits:
-                    missing.append("limits")
-                missing_str = " and ".join(missing)
-                print_result("WARN", f"Container {ns}/{name}:{cname} has missing resource {missing_str}.")
-
-    if not issues_found:
-        print_result("OK", "All containers have resource requests and limits defined.")
-    return fail_found
+def _gib(milli: int) -> str:
+    return f"{milli / 1000 / 2**30:.1f}Gi"
 
 
-def check_node_conditions(nodes: List[client.V1Node]) -> bool:
-    print_header("Node Conditions")
-    fail_found = False
-    issues_found = False
-
-    for node in nodes:
-        name = node.metadata.name
-        conds = node.status.conditions or []
-
-        ready_status = None
-
-        for cond in conds:
-            ctype = cond.type
-            if ctype == "Ready":
-                ready_status = cond.status
-                if cond.status != "True":
-                    issues_found = True
-                    fail_found = True
-                    print_result(
-                        "FAIL",
-                        f"Node {name} is NotReady (status={cond.status}, reason={cond.reason}, message={cond.message}).",
-                    )
-            elif ctype == "DiskPressure":
-                if cond.status == "True":
-                    issues_found = True
-                    fail_found = True
-                    print_result(
-                        "FAIL", f"Node {name} has DiskPressure (reason={cond.reason}, message={cond.message})."
-                    )
-            elif ctype == "MemoryPressure":
-                if cond.status == "True":
-                    issues_found = True
-                    fail_found = True
-                    print_result(
-                        "FAIL", f"Node {name} has MemoryPressure (reason={cond.reason}, message={cond.message})."
-                    )
-
-        if ready_status is None:
-            issues_found = True
-            fail_found = True
-            print_result("FAIL", f"Node {name} has no Ready condition reported.")
-
-    if not issues_found:
-        print_result("OK", "All nodes are Ready with no DiskPressure or MemoryPressure.")
-    return fail_found
+NODE_REQUEST_WARN_PERCENT = 90
+NODE_LIMIT_WARN_PERCENT = 150
 
 
-def _event_timestamp(ev: client.CoreV1Event) -> Optional[datetime.datetime]:
-    for attr in ("event_time", "last_timestamp", "first_timestamp", "metadata"):
-        value = getattr(ev, attr, None)
-        if not value:
+@rule(
+    "node-commitment",
+    "Node Resource Commitment",
+    "capacity",
+    "FAIL",
+    f"No node has requests above {NODE_REQUEST_WARN_PERCENT}% or limits above "
+    f"{NODE_LIMIT_WARN_PERCENT}% of allocatable.",
+)
+def check_node_commitment(node: Dict[str, Any], nc: NodeCommitment) -> Iterator[Tuple[str, str]]:
+    for resource, used, limits, allocatable, fmt in (
+        ("CPU", nc.cpu_requests, nc.cpu_limits, nc.cpu_allocatable, lambda m: f"{_cores(m)} cores"),
+        ("memory", nc.memory_requests, nc.memory_limits, nc.memory_allocatable, _gib),
+    ):
+        if not allocatable:
             continue
-        if attr == "metadata":
-            ts = getattr(value, "creation_timestamp", None)
-        else:
-            ts = value
-        if ts:
-            return ts
-    return None
-
+        percent = used * 100 / allocatable
+        detail = f"{fmt(used)} of {fmt(allocatable)} allocatable ({percent:.0f}%, {nc.pods} pods)"
+        if used > allocatable:
+            yield "FAIL", f"Node {nc.name} {resource} requests exceed allocatable: {detail}."
+        elif used * 100 >= allocatable * NODE_REQUEST_WARN_PERCENT:
+            yield "WARN", f"Node {nc.name} has little {resource} headroom: requests {detail}."
+        if limits * 100 > allocatable * NODE_LIMIT_WARN_PERCENT:
+            yield (
+                "WARN",
+                f"Node {nc.name} {resource} limits overcommitted: {fmt(limits)} of {fmt(allocatable)} "
+                f"allocatable ({limits * 100 / allocatable:.0f}%).",
+            )
+
+
+HEADROOM_TOP_N = 5
+
+
+def _fragmentation(free: List[int]) -> float:
+    # Share of the free capacity that is not in the single largest block:
+    # 0% when all of it sits on one node, close to 100% when it is spread
+    # in slivers no larger pod can use.
+    total = sum(free)
+    return 1 - max(free) / total if total else 0.0
+
+
+@rule(
+    "node-headroom",
+    "Node Headroom / Bin-Packing",
+    "cluster",
+    "INFO",
+    "No nodes with allocatable capacity found.",
+)
+def check_node_headroom(cluster: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    nodes = [nc for nc in cluster["nodes"] if nc.cpu_allocatable and nc.memory_allocatable]
+    if not nodes:
+        return
 
-def check_recent_events(events: List[client.CoreV1Event]) -> bool:
-    print_header("Recent Warning Events")
-    fail_found = False
-    issues_found = False
-
-    now = datetime.datetime.now(datetime.timezone.utc)
-    window_minutes = 60
-    cutoff = now - datetime.timedelta(minutes=window_minutes)
-
-    fail_reasons = {
-        "FailedScheduling",
-        "FailedMount",
-        "FailedAttachVolume",
-        "FailedCreatePodSandBox",
-        "FailedCreatePodSandbox",
-        "SandboxChanged",
-    }
+    top_cpu = heapq.nlargest(HEADROOM_TOP_N, nodes, key=lambda nc: nc.cpu_request_ratio)
+    yield "INFO", "Highest CPU request commitment: " + ", ".join(
+        f"{nc.name} {nc.cpu_request_ratio:.0%} ({_cores(nc.cpu_requests)}/{_cores(nc.cpu_allocatable)} cores)"
+        for nc in top_cpu
+    )
+    top_memory = heapq.nlargest(HEADROOM_TOP_N, nodes, key=lambda nc: nc.memory_request_ratio)
+    yield "INFO", "Highest memory request commitment: " + ", ".join(
+        f"{nc.name} {nc.memory_request_ratio:.0%} ({_gib(nc.memory_requests)}/{_gib(nc.memory_allocatable)})"
+        for nc in top_memory
+    )
+
+    # Stranded capacity: free CPU on a node with no free memory (or the
+    # reverse) cannot be scheduled.
+    def stranded(nc: NodeCommitment) -> float:
+        return abs(nc.cpu_free / nc.cpu_allocatable - nc.memory_free / nc.memory_allocatable)
+
+    top_stranded = [nc for nc in heapq.nlargest(HEADROOM_TOP_N, nodes, key=stranded) if stranded(nc) > 0]
+    if top_stranded:
+        yield "INFO", "Most stranded free capacity: " + ", ".join(
+            f"{nc.name} {nc.cpu_free / nc.cpu_allocatable:.0%} CPU / "
+            f"{nc.memory_free / nc.memory_allocatable:.0%} memory free"
+            for nc in top_stranded
+        )
 
+    cpu_free = [nc.cpu_free for nc in nodes]
+    memory_free = [nc.memory_free for nc in nodes]
+    yield (
+        "INFO",
+        f"Free capacity fragmentation across {len(nodes)} nodes: "
+        f"CPU {_cores(sum(cpu_free))} cores free, largest block {_cores(max(cpu_free))} cores "
+        f"({_fragmentation(cpu_free):.0%} fragmented); "
+        f"memory {_gib(sum(memory_free))} free, largest block {_gib(max(memory_free))} "
+        f"({_fragmentation(memory_free):.0%} fragmented).",
+    )
+
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _event_timestamp(ev: Dict[str, Any]) -> Optional[datetime.datetime]:
+    # Most recent occurrence: series.lastObservedTime for new-style events
+    # that repeat, lastTimestamp for old-style ones.
+    last_observed = (ev.get("series") or {}).get("lastObservedTime")
+    if last_observed:
+        return parse_time(last_observed)
+    for field in ("lastTimestamp", "eventTime", "firstTimestamp"):
+        if ev.get(field):
+            return parse_time(ev[field])
+    return parse_time((ev.get("metadata") or {}).get("creationTimestamp"))
+
+
+def _event_count(ev: Dict[str, Any]) -> int:
+    return (ev.get("series") or {}).get("count") or ev.get("count") or 1
+
+
+def recent_events(
+    events: Iterable[Dict[str, Any]],
+    marks: Dict[str, str],
+    scope: str,
+    now: datetime.datetime,
+) -> Iterator[Dict[str, Any]]:
+    # Drops events outside the window ending at now and events not newer
+    # than the high-water mark stored for scope, and advances the mark in
+    # place.
+    cutoff = now - datetime.timedelta(minutes=EVENT_WINDOW_MINUTES)
+    mark = parse_time(marks.get(scope))
+    if mark is not None and mark > cutoff:
+        cutoff = mark
+
+    newest = mark
     for ev in events:
         ts = _event_timestamp(ev)
-        if ts and ts < cutoff:
-            continue
+        if ts is not None:
+            if ts <= cutoff:
+                continue
+            if newest is None or ts > newest:
+                newest = ts
+        yield ev
+
+    if newest is not None:
+        marks[scope] = newest.isoformat()
+
+
+def aggregate_events(events: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    # One event per (reason, involvedObject), keeping the latest occurrence
+    # and the total count across all of them.
+    latest: Dict[Tuple, Dict[str, Any]] = {}
+    counts: Dict[Tuple, int] = {}
+    epoch = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+    for ev in events:
+        involved = ev.get("involvedObject") or {}
+        key = (ev.get("reason"), involved.get("kind"), involved.get("namespace"), involved.get("name"))
+        counts[key] = counts.get(key, 0) + _event_count(ev)
+        current = latest.get(key)
+        if current is None or (_event_timestamp(ev) or epoch) >= (_event_timestamp(current) or epoch):
+            latest[key] = ev
+
+    for key, ev in latest.items():
+        merged = dict(ev)
+        merged["series"] = None
+        merged["count"] = counts[key]
+        ts = _event_timestamp(ev)
+        if ts is not None:
+            merged["lastTimestamp"] = ts.isoformat()
+        yield merged
+
 
-        reason = (ev.reason or "").strip()
-        ev_type = (ev.type or "").strip()
-        involved = ev.involved_object
-        ns = getattr(involved, "namespace", None)
-        name = getattr(involved, "name", None)
-        kind = getattr(involved, "kind", None)
+def load_event_marks(path: Optional[str]) -> Dict[str, str]:
+    if not path:
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
 
-        is_failure_reason = reason in fail_reasons or reason.startswith("Failed")
 
-        if ev_type == "Warning" or is_failure_reason:
-            issues_found = True
-            message = ev.message or ""
-            target = f"{kind} {ns}/{name}" if ns else f"{kind} {name}"
-            if is_failure_reason:
-                fail_found = True
-                print_result("FAIL", f"Recent event [{reason}] on {target}: {message}")
+def save_event_marks(path: Optional[str], marks: Dict[str, str]) -> None:
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(marks, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+EVENT_WINDOW_MINUTES = 60
+
+EVENT_FAIL_REASONS = {
+    "FailedScheduling",
+    "FailedMount",
+    "FailedAttachVolume",
+    "FailedCreatePodSandBox",
+    "FailedCreatePodSandbox",
+    "SandboxChanged",
+}
+
+
+@rule(
+    "recent-events",
+    "Recent Warning Events",
+    "event",
+    "FAIL",
+    f"No recent problematic events in the last {EVENT_WINDOW_MINUTES} minutes.",
+)
+def check_recent_events(ev: Dict[str, Any], now: datetime.datetime) -> Iterator[Tuple[str, str]]:
+    cutoff = now - datetime.timedelta(minutes=EVENT_WINDOW_MINUTES)
+
+    ts = _event_timestamp(ev)
+    if ts and ts < cutoff:
+        return
+
+    reason = (ev.get("reason") or "").strip()
+    ev_type = (ev.get("type") or "").strip()
+    involved = ev.get("involvedObject") or {}
+    ns = involved.get("namespace")
+    name = involved.get("name")
+    kind = involved.get("kind")
+
+    # Any "Failed*" reason on a Warning event counts as a failure; for the
+    # other types only EVENT_FAIL_REASONS does, the set get_events asks
+    # the API server for.
+    is_failure_reason = reason in EVENT_FAIL_REASONS or (ev_type == "Warning" and reason.startswith("Failed"))
+
+    if ev_type == "Warning" or is_failure_reason:
+        message = ev.get("message") or ""
+        count = _event_count(ev)
+        if count > 1:
+            message = f"{message} (x{count})"
+        target = f"{kind} {ns}/{name}" if ns else f"{kind} {name}"
+        if is_failure_reason:
+            yield "FAIL", f"Recent event [{reason}] on {target}: {message}"
+        else:
+            yield "WARN", f"Recent warning event [{reason}] on {target}: {message}"
+
+
+def rule_findings(rule_obj: Rule, kind: str, obj: Dict[str, Any], *args) -> Iterator[Finding]:
+    meta = obj["metadata"]
+    for severity, message in rule_obj.check(obj, *args):
+        yield Finding(
+            rule_id=rule_obj.id,
+            severity=severity,
+            message=message,
+            kind=kind,
+            namespace=meta.get("namespace"),
+            name=meta.get("name"),
+            uid=meta.get("uid"),
+        )
+
+
+Owner = Tuple[str, str, str, Optional[str]]
+
+
+def _controller_ref(obj: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    for ref in obj["metadata"].get("ownerReferences") or []:
+        if ref.get("controller"):
+            return ref
+    return None
+
+
+def _listed_reader(
+    list_all: Callable[..., Any], list_namespaced: Callable[..., Any], all_namespaces: bool
+) -> Callable[[str, str], Dict[str, Any]]:
+    # Reader backed by paginated metadata-only lists: one across all
+    # namespaces, or one per namespace when the run is scoped (the RBAC may
+    # not allow the cluster-wide list). A name that is not indexed yet,
+    # e.g. a ReplicaSet created since by a rollout, lists again; OwnerIndex
+    # memoizes what it resolved, so that happens once per owner. A name
+    # that is still missing raises KeyError.
+    index: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def read(name: str, namespace: str) -> Dict[str, Any]:
+        key = (namespace, name)
+        if key not in index:
+            if all_namespaces:
+                items = paginate_raw(list_all, _headers=METADATA_ONLY_HEADERS)
             else:
-                print_result("WARN", f"Recent warning event [{reason}] on {target}: {message}")
+                items = paginate_raw(list_namespaced, namespace=namespace, _headers=METADATA_ONLY_HEADERS)
+            for obj in items:
+                meta = obj["metadata"]
+                index[(meta.get("namespace") or "", meta["name"])] = {"metadata": meta}
+        return index[key]
+
+    return read
+
+
+class OwnerIndex:
+    # Resolves a pod to its top-level workload (Deployment, StatefulSet,
+    # DaemonSet, CronJob, ...) as (kind, namespace, name, uid). Intermediate
+    # ReplicaSets and Jobs are looked up once and memoized, so sibling pods
+    # cost a dict lookup. If an owner cannot be read (RBAC, already deleted,
+    # not in the snapshot) the chain stops there.
+
+    def __init__(self, readers: Dict[str, Callable[[str, str], Dict[str, Any]]]):
+        self._readers = readers
+        self._owners: Dict[Tuple[str, str, str], Owner] = {}
+
+    @classmethod
+    def live(cls, api_client: Optional[client.ApiClient] = None, all_namespaces: bool = True) -> "OwnerIndex":
+        apps = client.AppsV1Api(api_client)
+        batch = client.BatchV1Api(api_client)
+        return cls(
+            {
+                "ReplicaSet": _listed_reader(
+                    apps.list_replica_set_for_all_namespaces, apps.list_namespaced_replica_set, all_namespaces
+                ),
+                "Job": _listed_reader(batch.list_job_for_all_namespaces, batch.list_namespaced_job, all_namespaces),
+            }
+        )
 
-    if not issues_found:
-        print_result("OK", f"No recent problematic events in the last {window_minutes} minutes.")
+    def _resolve(self, namespace: str, ref: Dict[str, Any]) -> Owner:
+        key = (namespace, ref["kind"], ref["name"])
+        owner = self._owners.get(key)
+        if owner is not None:
+            return owner
+
+        owner = (ref["kind"], namespace, ref["name"], ref.get("uid"))
+        reader = self._readers.get(ref["kind"])
+        if reader is not None:
+            try:
+                parent = _controller_ref(reader(ref["name"], namespace))
+            except (ApiException, KeyError):
+                parent = None
+            if parent is not None:
+                owner = self._resolve(namespace, parent)
+
+        self._owners[key] = owner
+        return owner
+
+    def owner(self, pod: Dict[str, Any]) -> Optional[Owner]:
+        ref = _controller_ref(pod)
+        if ref is None:
+            return None
+        return self._resolve(pod["metadata"].get("namespace") or "", ref)
+
+
+def _template_key(pod: Dict[str, Any], owner: Owner) -> Tuple:
+    # Pods of one workload can run different templates mid-rollout; the
+    # template hash labels tell them apart.
+    labels = pod["metadata"].get("labels") or {}
+    return owner + (labels.get("pod-template-hash") or labels.get("controller-revision-hash") or "",)
+
+
+def template_findings(
+    rules: List[Rule], pod: Dict[str, Any], owner: Owner, template_hash: str = ""
+) -> Iterator[Finding]:
+    # Run template rules against the pod spec under the owner's identity, so
+    # messages name the workload ("Container prod/deployment/web:app ...").
+    kind, namespace, name, uid = owner
+    template = {
+        "metadata": {"namespace": namespace, "name": f"{kind.lower()}/{name}", "uid": uid},
+        "spec": pod["spec"],
+    }
+    for container in pod["spec"].get("containers") or []:
+        for r in rules:
+            for finding in rule_findings(r, kind, template, container):
+                finding.name = name
+                finding.template = template_hash
+                yield finding
+
+
+def evaluate(
+    rules: List[Rule],
+    pods: Iterable[Dict[str, Any]],
+    nodes: Iterable[Dict[str, Any]],
+    events: Iterable[Dict[str, Any]],
+    owners: Optional[OwnerIndex] = None,
+    now: Optional[datetime.datetime] = None,
+) -> Iterator[Finding]:
+    # Event rules look back from now: the current time, or the capture
+    # time when checking a snapshot.
+    by_scope: Dict[str, List[Rule]] = {scope: [] for scope in RULE_SCOPES}
+    for r in rules:
+        by_scope[r.scope].append(r)
+
+    pod_rules = by_scope["pod"]
+    container_rules = by_scope["container"]
+    template_rules = [r for r in container_rules if r.template] if owners is not None else []
+    replica_rules = [r for r in container_rules if r not in template_rules]
+
+    # Template findings are held back until all pods are seen so they can
+    # carry the replica count; there is one entry per workload template.
+    templates: Dict[Tuple, List[Finding]] = {}
+    replicas: Dict[Tuple, int] = {}
+
+    # Requests/limits per node for the capacity rules: CPU_REQUESTS ..
+    # MEMORY_LIMITS, then the pod count. Pods that finished no longer hold
+    # their resources.
+    need_totals = bool(by_scope["capacity"] or by_scope["cluster"])
+    pod_totals: Dict[str, List[int]] = {}
+
+    if pod_rules or container_rules or need_totals:
+        for pod in pods:
+            for r in pod_rules:
+                yield from rule_findings(r, "Pod", pod)
+
+            if need_totals:
+                node_name = pod["spec"].get("nodeName")
+                phase = (pod.get("status") or {}).get("phase")
+                if node_name and phase not in ("Succeeded", "Failed"):
+                    totals = pod_totals.setdefault(node_name, [0, 0, 0, 0, 0])
+                    for i, v in enumerate(pod_resource_vector(pod)):
+                        totals[i] += v
+                    totals[4] += 1
+
+            owner = owners.owner(pod) if template_rules else None
+            if owner is not None:
+                key = _template_key(pod, owner)
+                if key not in templates:
+                    templates[key] = list(template_findings(template_rules, pod, owner, key[-1]))
+                replicas[key] = replicas.get(key, 0) + 1
+                pod_container_rules = replica_rules
+            else:
+                pod_container_rules = container_rules
+
+            if pod_container_rules:
+                for container in pod["spec"].get("containers") or []:
+                    for r in pod_container_rules:
+                        yield from rule_findings(r, "Pod", pod, container)
+
+    for key, found in templates.items():
+        count = replicas[key]
+        for finding in found:
+            finding.message = f"{finding.message} ({count} replica{'s' if count != 1 else ''})"
+            yield finding
+
+    node_rules = by_scope["node"]
+    capacity_rules = by_scope["capacity"]
+    cluster_rules = by_scope["cluster"]
+    commitments: List[NodeCommitment] = []
+    if node_rules or capacity_rules or cluster_rules:
+        for node in nodes:
+            for r in node_rules:
+                yield from rule_findings(r, "Node", node)
+            if capacity_rules or cluster_rules:
+                name = node["metadata"]["name"]
+                allocatable = (node.get("status") or {}).get("allocatable") or {}
+                nc = NodeCommitment(name, milli_value(allocatable.get("cpu")), milli_value(allocatable.get("memory")))
+                vector = pod_totals.get(name)
+                if vector is not None:
+                    nc.cpu_requests, nc.cpu_limits, nc.memory_requests, nc.memory_limits, nc.pods = vector
+                commitments.append(nc)
+                for r in capacity_rules:
+                    yield from rule_findings(r, "Node", node, nc)
+
+    for r in cluster_rules:
+        yield from rule_findings(r, "Cluster", {"metadata": {}, "nodes": commitments})
+
+    event_rules = by_scope["event"]
+    if event_rules:
+        if now is None:
+            now = utcnow()
+        for ev in events:
+            for r in event_rules:
+                yield from rule_findings(r, "Event", ev, now)
+
+
+def group_findings(rules: List[Rule], findings: Iterable[Finding]) -> Dict[str, List[Finding]]:
+    by_rule: Dict[str, List[Finding]] = {r.id: [] for r in rules}
+    for finding in findings:
+        by_rule[finding.rule_id].append(finding)
+    return by_rule
+
+
+def print_findings(rules: List[Rule], by_rule: Dict[str, List[Finding]], baseline: bool = False) -> bool:
+    fail_found = False
+    for r in rules:
+        print_header(r.title)
+        found = by_rule[r.id]
+        for finding in found:
+            if finding.change == "resolved":
+                print_result("OK", f"Resolved: {finding.message}")
+                continue
+            if finding.severity == "FAIL":
+                fail_found = True
+            if finding.change == "new":
+                print_result(finding.severity, f"New: {finding.message}")
+            else:
+                print_result(finding.severity, finding.message)
+        if not found:
+            print_result("OK", "No changes since the baseline." if baseline else r.ok_message)
     return fail_found
 
 
-def ask_namespace_choice(v1: client.CoreV1Api) -> Tuple[Optional[str], str]:
+_DIGITS = re.compile(r"\d+")
+
+
+def fingerprint(finding: Finding) -> str:
+    # Stable identity of a finding across runs: rule, object, template and
+    # the message with numbers masked, so restart/replica/event counts do not
+    # make a known issue look new. Event findings are identified by their
+    # message (reason and involved object), not by the Event's own name.
+    name = "" if finding.kind == "Event" else finding.name or ""
+    parts = (
+        finding.rule_id,
+        finding.kind,
+        finding.namespace or "",
+        name,
+        finding.template or "",
+        _DIGITS.sub("#", finding.message),
+    )
+    return hashlib.sha1("\0".join(parts).encode()).hexdigest()
+
+
+class BaselineStore:
+    # SQLite table of finding fingerprints. Diffing loads the fingerprints
+    # in scope into a set once, so a run costs O(findings) set lookups plus
+    # one batched write.
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS findings (
+                fingerprint TEXT PRIMARY KEY,
+                rule_id TEXT NOT NULL,
+                severity TEXT NOT NULL,
+                message TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                namespace TEXT,
+                name TEXT,
+                uid TEXT,
+                template TEXT,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS findings_rule_ns ON findings (rule_id, namespace)")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _scope(self, rule_ids: List[str], namespaces: List[Optional[str]]) -> Tuple[str, List[str]]:
+        # Only compare against findings this run could have reproduced:
+        # same rules, and the scanned namespaces plus cluster-scoped ones.
+        where = f"rule_id IN ({','.join('?' * len(rule_ids))})"
+        params = list(rule_ids)
+        scoped = [ns for ns in namespaces if ns is not None]
+        if len(scoped) == len(namespaces):
+            where += f" AND (namespace IS NULL OR namespace IN ({','.join('?' * len(scoped))}))"
+            params += scoped
+        return where, params
+
+    def fingerprints(self, rule_ids: List[str], namespaces: List[Optional[str]]) -> Set[str]:
+        where, params = self._scope(rule_ids, namespaces)
+        return {row[0] for row in self.conn.execute(f"SELECT fingerprint FROM findings WHERE {where}", params)}
+
+    def load(self, fingerprints: Iterable[str]) -> Iterator[Finding]:
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (fingerprint TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM wanted")
+        self.conn.executemany("INSERT OR IGNORE INTO wanted VALUES (?)", ((fp,) for fp in fingerprints))
+        rows = self.conn.execute(
+            "SELECT rule_id, severity, message, kind, namespace, name, uid, template "
+            "FROM findings JOIN wanted USING (fingerprint) ORDER BY rule_id, namespace, name"
+        )
+        for row in rows:
+            yield Finding(*row)
+
+    def update(self, current: Dict[str, Finding], resolved: Iterable[str]) -> None:
+        now = utcnow().isoformat()
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (fingerprint) DO UPDATE SET
+                    severity = excluded.severity,
+                    message = excluded.message,
+                    uid = excluded.uid,
+                    last_seen = excluded.last_seen
+                """,
+                (
+                    (fp, f.rule_id, f.severity, f.message, f.kind, f.namespace, f.name, f.uid, f.template, now, now)
+                    for fp, f in current.items()
+                ),
+            )
+            self.conn.executemany("DELETE FROM findings WHERE fingerprint = ?", ((fp,) for fp in resolved))
+
+
+def diff_against_baseline(
+    findings: Iterable[Finding],
+    store: BaselineStore,
+    rules: List[Rule],
+    namespaces: List[Optional[str]],
+    update: bool = True,
+) -> Iterator[Finding]:
+    # New findings stream out as they are found; resolved ones are only
+    # known once every current finding has been seen.
+    known = store.fingerprints([r.id for r in rules], namespaces)
+    current: Dict[str, Finding] = {}
+    for finding in findings:
+        fp = fingerprint(finding)
+        if fp in current:
+            continue
+        current[fp] = finding
+        if fp not in known:
+            finding.change = "new"
+            yield finding
+
+    resolved = known.difference(current)
+    for finding in store.load(resolved):
+        finding.change = "resolved"
+        yield finding
+
+    if update:
+        store.update(current, resolved)
+
+
+def ask_namespace_choice(v1: Source) -> Tuple[Optional[str], str]:
     print_header("Namespace Selection")
 
     while True:
@@ -405,45 +1164,333 @@ def ask_namespace_choice(v1: client.CoreV1Api) -> Tuple[Optional[str], str]:
         print_result("WARN", "Please type 'all' or 'specific'.")
 
 
+class NdjsonWriter(NdjsonRecordWriter):
+    # Flushes every finding so consumers see it while the run continues.
+
+    def __init__(self, out: TextIO, rules: List[Rule]):
+        super().__init__(out, [])
+
+    def write(self, finding: Finding) -> None:
+        super().write(asdict(finding))
+        self.out.flush()
+
+
+def _finding_target(finding: Finding) -> str:
+    if finding.namespace:
+        return f"{finding.kind}/{finding.namespace}/{finding.name}"
+    return f"{finding.kind}/{finding.name}"
+
+
+class JunitWriter:
+    # One testcase per finding (FAIL -> <failure>, WARN -> <system-out>) and
+    # one passing testcase per rule without findings. Suite totals are left
+    # out so testcases can be written as they arrive.
+
+    def __init__(self, out: TextIO, rules: List[Rule]):
+        self.out = out
+        self.rules = rules
+        self.seen: Dict[str, int] = {r.id: 0 for r in rules}
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        out.write('<testsuites name="k8s_health_check">\n<testsuite name="k8s_health_check">\n')
+
+    def write(self, finding: Finding) -> None:
+        self.seen[finding.rule_id] += 1
+        self.out.write(
+            f"<testcase classname={quoteattr(finding.rule_id)} name={quoteattr(_finding_target(finding))}>"
+        )
+        if finding.change == "resolved":
+            self.out.write(f"<system-out>{quoteattr(f'[RESOLVED] {finding.message}')[1:-1]}</system-out>")
+        elif finding.severity == "FAIL":
+            self.out.write(f'<failure type="FAIL" message={quoteattr(finding.message)}/>')
+        else:
+            self.out.write(
+                f"<system-out>{quoteattr(f'[{finding.severity}] {finding.message}')[1:-1]}</system-out>"
+            )
+        self.out.write("</testcase>\n")
+        self.out.flush()
+
+    def close(self) -> None:
+        for r in self.rules:
+            if not self.seen[r.id]:
+                self.out.write(f"<testcase classname={quoteattr(r.id)} name={quoteattr(r.title)}/>\n")
+        self.out.write("</testsuite>\n</testsuites>\n")
+        self.out.flush()
+
+
+SARIF_LEVELS = {"FAIL": "error", "WARN": "warning"}
+SARIF_BASELINE_STATES = {"new": "new", "resolved": "absent"}
+
+
+class SarifWriter:
+    def __init__(self, out: TextIO, rules: List[Rule]):
+        self.out = out
+        self.first = True
+        driver = {
+            "name": "k8s_health_check",
+            "rules": [
+                {
+                    "id": r.id,
+                    "name": r.title,
+                    "shortDescription": {"text": r.title},
+                    "defaultConfiguration": {"level": SARIF_LEVELS.get(r.severity, "note")},
+                }
+                for r in rules
+            ],
+        }
+        header = json.dumps(
+            {
+                "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+                "version": "2.1.0",
+                "runs": [{"tool": {"driver": driver}, "results": []}],
+            }
+        )
+        # Stream results by writing the document up to the open results array.
+        self.out.write(header[: -len("]}]}")])
+
+    def write(self, finding: Finding) -> None:
+        result = {
+            "ruleId": finding.rule_id,
+            "level": SARIF_LEVELS.get(finding.severity, "note"),
+            "message": {"text": finding.message},
+            "locations": [
+                {
+                    "logicalLocations": [
+                        {"fullyQualifiedName": _finding_target(finding), "kind": "resource"}
+                    ]
+                }
+            ],
+        }
+        if finding.change:
+            result["baselineState"] = SARIF_BASELINE_STATES[finding.change]
+        self.out.write(("" if self.first else ",") + "\n" + json.dumps(result))
+        self.first = False
+        self.out.flush()
+
+    def close(self) -> None:
+        self.out.write("\n]}]}\n")
+        self.out.flush()
+
+
+WRITERS = {"ndjson": NdjsonWriter, "junit": JunitWriter, "sarif": SarifWriter}
+
+
+def select_rules(parser: argparse.ArgumentParser, checks: Optional[str]) -> List[Rule]:
+    if not checks:
+        return list(RULES)
+    known = {r.id for r in RULES}
+    requested = [c.strip() for c in checks.split(",") if c.strip()]
+    unknown = [c for c in requested if c not in known]
+    if unknown:
+        parser.error(f"unknown check(s): {', '.join(unknown)}; valid: {', '.join(sorted(known))}")
+    return [r for r in RULES if r.id in requested]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Kubernetes health check")
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument("-A", "--all-namespaces", action="store_true", help="Scan all namespaces")
+    scope.add_argument(
+        "-n",
+        "--namespace",
+        action="append",
+        dest="namespaces",
+        help="Namespace to scan (repeatable)",
+    )
+    parser.add_argument("--checks", help="Comma-separated rule ids to run (default: all)")
+    parser.add_argument("--list-checks", action="store_true", help="List available rule ids and exit")
+    parser.add_argument("--output", choices=["text"] + sorted(WRITERS), default="text")
+    parser.add_argument(
+        "--snapshot",
+        metavar="PATH",
+        help="Check a recorded snapshot (dump directory or NDJSON bundle, see k8s_snapshot) "
+        "instead of the live cluster",
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="DB",
+        help="SQLite file of known findings; only report findings that are new or resolved "
+        "since the last run, then record the current ones",
+    )
+    parser.add_argument(
+        "--freeze-baseline",
+        action="store_true",
+        help="With --baseline, compare without recording the current findings",
+    )
+    parser.add_argument(
+        "--per-pod",
+        action="store_true",
+        help="Report pod-template findings for every replica instead of once per workload",
+    )
+    parser.add_argument(
+        "--state-file",
+        help="JSON file holding the newest event timestamp seen per scope; "
+        "later runs with the same file only report newer events",
+    )
+    args = parser.parse_args(argv)
+
+    if args.freeze_baseline and not args.baseline:
+        parser.error("--freeze-baseline needs --baseline")
+    args.rules = select_rules(parser, args.checks)
+    return args
+
+
+def resolve_namespaces(args: argparse.Namespace, v1: Source) -> Tuple[List[Optional[str]], str]:
+    if args.all_namespaces:
+        return [None], "all namespaces"
+    if args.namespaces:
+        return list(args.namespaces), "namespace(s) " + ", ".join(f"'{ns}'" for ns in args.namespaces)
+    if args.output == "text" and sys.stdin.isatty():
+        namespace, ns_desc = ask_namespace_choice(v1)
+        return [namespace], ns_desc
+    return [None], "all namespaces"
+
+
+def fetch_all(
+    v1: Source,
+    namespaces: List[Optional[str]],
+    counts: Dict[str, int],
+    marks: Dict[str, str],
+    now: datetime.datetime,
+):
+    pods = counted(chain.from_iterable(get_pods(v1, ns) for ns in namespaces), counts, "pods")
+    nodes = counted(get_nodes(v1), counts, "nodes")
+    events = chain.from_iterable(
+        recent_events(counted(get_events(v1, ns), counts, "events"), marks, ns or "*", now)
+        for ns in namespaces
+    )
+    return pods, nodes, aggregate_events(events)
+
+
+def owner_index(args: argparse.Namespace, v1: Source, namespaces: List[Optional[str]]) -> Optional[OwnerIndex]:
+    if args.per_pod:
+        return None
+    if isinstance(v1, Snapshot):
+        return OwnerIndex(v1.owner_readers())
+    return OwnerIndex.live(v1.api_client, all_namespaces=None in namespaces)
+
+
+def run_checks(
+    args: argparse.Namespace,
+    v1: Source,
+    namespaces: List[Optional[str]],
+    counts: Dict[str, int],
+    marks: Dict[str, str],
+    store: Optional[BaselineStore],
+    now: datetime.datetime,
+) -> Iterator[Finding]:
+    findings = evaluate(
+        args.rules, *fetch_all(v1, namespaces, counts, marks, now), owner_index(args, v1, namespaces), now
+    )
+    if store is None:
+        return findings
+    return diff_against_baseline(findings, store, args.rules, namespaces, update=not args.freeze_baseline)
+
+
+def run_streaming(
+    args: argparse.Namespace,
+    v1: Source,
+    namespaces: List[Optional[str]],
+    store: Optional[BaselineStore],
+    now: datetime.datetime,
+) -> bool:
+    writer = WRITERS[args.output](sys.stdout, args.rules)
+    any_fail = False
+    counts: Dict[str, int] = {}
+    marks = load_event_marks(args.state_file)
+    findings = run_checks(args, v1, namespaces, counts, marks, store, now)
+    try:
+        while True:
+            # Only errors raised while producing findings are fetch errors;
+            # the writer's own errors are handled below.
+            try:
+                finding = next(findings)
+            except StopIteration:
+                break
+            except Exception as exc:
+                print(f"Error fetching data from cluster: {exc}", file=sys.stderr)
+                sys.exit(1)
+            if finding.severity == "FAIL" and finding.change != "resolved":
+                any_fail = True
+            writer.write(finding)
+        writer.close()
+    except BrokenPipeError:
+        # The reader went away (e.g. "| head"). Point stdout at devnull so
+        # the flush at interpreter exit does not fail again. The baseline
+        # and event marks are left as they were, since not every finding
+        # was seen.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        if store is not None:
+            store.close()
+    save_event_marks(args.state_file, marks)
+    return any_fail
+
+
 def main() -> None:
-    load_kube_config()
-    v1 = get_core_v1_api()
+    args = parse_args()
+    if args.list_checks:
+        for r in RULES:
+            print(f"{r.id:20} {r.severity:5} {r.title}")
+        return
 
-    namespace, ns_desc = ask_namespace_choice(v1)
+    if args.snapshot:
+        try:
+            v1: Source = Snapshot(args.snapshot)
+        except FileNotFoundError as exc:
+            print_result("FAIL", str(exc))
+            sys.exit(1)
+    else:
+        load_kube_config()
+        v1 = get_core_v1_api()
+
+    namespaces, ns_desc = resolve_namespaces(args, v1)
+    if None not in namespaces:
+        # Also keeps a scoped --baseline run from resolving node findings
+        # that a cluster-wide run recorded.
+        skipped = [r.id for r in args.rules if r.scope in NODE_TOTAL_SCOPES]
+        if skipped:
+            args.rules = [r for r in args.rules if r.scope not in NODE_TOTAL_SCOPES]
+            print(
+                f"Skipping {', '.join(skipped)}: node totals need all namespaces (use -A).",
+                file=sys.stdout if args.output == "text" else sys.stderr,
+            )
+    # Reference time for the event window.
+    now = utcnow()
+    if args.snapshot:
+        ns_desc = f"{ns_desc} in snapshot {args.snapshot}"
+        now = v1.captured_at()
+
+    store = BaselineStore(args.baseline) if args.baseline else None
+
+    if args.output != "text":
+        sys.exit(1 if run_streaming(args, v1, namespaces, store, now) else 0)
 
     print_header("Fetching Cluster Data")
+    counts: Dict[str, int] = {}
+    marks = load_event_marks(args.state_file)
     try:
-        pods = get_pods(v1, namespace)
-        nodes = get_nodes(v1)
-        events = get_events(v1, namespace)
+        by_rule = group_findings(args.rules, run_checks(args, v1, namespaces, counts, marks, store, now))
         print_result(
-            "OK", f"Fetched {len(pods)} pods, {len(nodes)} nodes, " f"and {len(events)} events from {ns_desc}."
+            "OK",
+            f"Fetched {counts.get('pods', 0)} pods, {counts.get('nodes', 0)} nodes, "
+            f"and {counts.get('events', 0)} warning events from {ns_desc}.",
         )
     except Exception as exc:
         print_result("FAIL", f"Error fetching data from cluster: {exc}")
         sys.exit(1)
+    save_event_marks(args.state_file, marks)
 
-    any_fail = False
-
-    if check_pod_status_issues(pods):
-        any_fail = True
-
-    if check_containers_running_as_root(pods):
-        any_fail = True
-
-    if check_missing_probes(pods):
-        any_fail = True
-
-    if check_pods_resource_requests_limits(pods):
-        any_fail = True
-
-    if check_node_conditions(nodes):
-        any_fail = True
-
-    if check_recent_events(events):
-        any_fail = True
+    any_fail = print_findings(args.rules, by_rule, baseline=store is not None)
 
     print_header("Summary")
+    if store is not None:
+        store.close()
+        if any_fail:
+            print_result("FAIL", "New FAIL-level issues since the baseline were detected.")
+            sys.exit(1)
+        print_result("OK", "No new FAIL-level issues since the baseline.")
+        sys.exit(0)
     if any_fail:
         print_result("FAIL", "One or more FAIL-level issues were detected.")
         sys.exit(1)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+"""
+Continuous Kubernetes health check.
+
+Runs the rules registered in k8s_health_check against watch-backed caches of
+pods, nodes and events instead of re-listing the cluster on every run:
+
+- Each cache lists once and then follows a watch (see k8s_raw.ResourceCache).
+- When an object changes, only the rules for its scope are re-run for that
+  object, and its findings replace the previous ones in a live finding set
+  keyed by object UID and rule id. Deleted objects drop their findings.
+- Event findings are time-windowed, so event rules are re-run over the
+  cached events every --sweep seconds to let old events age out.
+- Finding counts per rule and severity are served in Prometheus text format
+  on http://<listen>:<port>/metrics. New and resolved findings are logged.
+
+Usage examples:
+  python3 k8s_health_daemon.py
+  python3 k8s_health_daemon.py -n prod -n staging --port 9105
+  python3 k8s_health_daemon.py --checks pod-status,node-conditions --quiet
+"""
+
+import argparse
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from k8s_health_check import (
+    NODE_TOTAL_SCOPES,
+    RULE_SCOPES,
+    Finding,
+    Rule,
+    get_core_v1_api,
+    load_kube_config,
+    print_result,
+    rule_findings,
+    select_rules,
+    utcnow,
+)
+from k8s_raw import ResourceCache
+
+DEFAULT_PORT = 9105
+SWEEP_SECONDS = 60.0
+SEVERITIES = ("FAIL", "WARN")
+
+ObjectKey = Tuple[str, str, str]
+
+
+def _object_key(kind: str, obj: Dict[str, Any]) -> ObjectKey:
+    meta = obj["metadata"]
+    return kind, meta.get("uid") or meta.get("namespace") or "", meta["name"]
+
+
+class FindingSet:
+    # Live findings keyed by object and rule id. Counts per (rule, severity)
+    # are kept up to date on every replace so /metrics never has to walk the
+    # whole set.
+
+    def __init__(self, rules: List[Rule], log: bool = True):
+        self.rules = rules
+        self.log = log
+        self.by_scope: Dict[str, List[Rule]] = {scope: [] for scope in RULE_SCOPES}
+        for r in rules:
+            self.by_scope[r.scope].append(r)
+        self._findings: Dict[ObjectKey, Dict[str, List[Finding]]] = {}
+        self._counts: Dict[Tuple[str, str], int] = {
+            (r.id, sev): 0 for r in rules for sev in SEVERITIES
+        }
+        self._lock = threading.Lock()
+
+    def _evaluate(self, kind: str, obj: Dict[str, Any]) -> Dict[str, List[Finding]]:
+        result: Dict[str, List[Finding]] = {}
+        if kind == "Pod":
+            for r in self.by_scope["pod"]:
+                result[r.id] = list(rule_findings(r, kind, obj))
+            for r in self.by_scope["container"]:
+                result[r.id] = [
+                    f
+                    for container in obj["spec"].get("containers") or []
+                    for f in rule_findings(r, kind, obj, container)
+                ]
+        elif kind == "Node":
+            for r in self.by_scope["node"]:
+                result[r.id] = list(rule_findings(r, kind, obj))
+        else:
+            now = utcnow()
+            for r in self.by_scope["event"]:
+                result[r.id] = list(rule_findings(r, kind, obj, now))
+        return {rule_id: found for rule_id, found in result.items() if found}
+
+    def _replace(self, key: ObjectKey, new: Dict[str, List[Finding]]) -> None:
+        with self._lock:
+            old = self._findings.pop(key, {})
+            if new:
+                self._findings[key] = new
+            for found in old.values():
+                for f in found:
+                    self._counts[(f.rule_id, f.severity)] -= 1
+            for found in new.values():
+                for f in found:
+                    self._counts[(f.rule_id, f.severity)] += 1
+
+        if self.log:
+            old_messages = {(f.severity, f.message) for found in old.values() for f in found}
+            new_messages = {(f.severity, f.message) for found in new.values() for f in found}
+            for severity, message in sorted(new_messages - old_messages):
+                print_result(severity, message)
+            for severity, message in sorted(old_messages - new_messages):
+                print_result("OK", f"Resolved: {message}")
+            sys.stdout.flush()
+
+    def update(self, kind: str, event_type: str, obj: Dict[str, Any]) -> None:
+        key = _object_key(kind, obj)
+        if event_type == "DELETED":
+            self._replace(key, {})
+        else:
+            self._replace(key, self._evaluate(kind, obj))
+
+    def handler(self, kind: str):
+        return lambda event_type, obj: self.update(kind, event_type, obj)
+
+    def counts(self) -> Dict[Tuple[str, str], int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+def render_metrics(findings: FindingSet, caches: Dict[str, List[ResourceCache]]) -> str:
+    lines = [
+        "# HELP k8s_health_findings Current findings per rule and severity.",
+        "# TYPE k8s_health_findings gauge",
+    ]
+    for (rule_id, severity), count in sorted(findings.counts().items()):
+        lines.append(f'k8s_health_findings{{rule="{rule_id}",severity="{severity}"}} {count}')
+
+    lines += [
+        "# HELP k8s_health_objects Objects held in the watch caches.",
+        "# TYPE k8s_health_objects gauge",
+    ]
+    for kind, kind_caches in caches.items():
+        total = sum(len(c.items()) for c in kind_caches)
+        lines.append(f'k8s_health_objects{{kind="{kind}"}} {total}')
+
+    lines += [
+        "# HELP k8s_health_synced Whether the initial list of every cache has completed.",
+        "# TYPE k8s_health_synced gauge",
+    ]
+    synced = all(c.synced for kind_caches in caches.values() for c in kind_caches)
+    lines.append(f"k8s_health_synced {int(synced)}")
+    return "\n".join(lines) + "\n"
+
+
+def make_handler(findings: FindingSet, caches: Dict[str, List[ResourceCache]]):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_metrics(findings, caches).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return MetricsHandler
+
+
+def start_caches(v1, findings: FindingSet, namespaces: Optional[List[str]]) -> Dict[str, List[ResourceCache]]:
+    caches: Dict[str, List[ResourceCache]] = {"Pod": [], "Node": [], "Event": []}
+    needs = {
+        "Pod": findings.by_scope["pod"] or findings.by_scope["container"],
+        "Node": findings.by_scope["node"],
+        "Event": findings.by_scope["event"],
+    }
+
+    if needs["Node"]:
+        caches["Node"].append(ResourceCache(v1.list_node, on_change=findings.handler("Node")))
+    for ns in namespaces or [None]:
+        if needs["Pod"]:
+            if ns is None:
+                cache = ResourceCache(v1.list_pod_for_all_namespaces, on_change=findings.handler("Pod"))
+            else:
+                cache = ResourceCache(v1.list_namespaced_pod, on_change=findings.handler("Pod"), namespace=ns)
+            caches["Pod"].append(cache)
+        if needs["Event"]:
+            if ns is None:
+                cache = ResourceCache(v1.list_event_for_all_namespaces, on_change=findings.handler("Event"))
+            else:
+                cache = ResourceCache(v1.list_namespaced_event, on_change=findings.handler("Event"), namespace=ns)
+            caches["Event"].append(cache)
+
+    for kind_caches in caches.values():
+        for cache in kind_caches:
+            cache.start()
+    return caches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Continuous Kubernetes health check with a /metrics endpoint")
+    parser.add_argument(
+        "-n",
+        "--namespace",
+        action="append",
+        dest="namespaces",
+        help="Namespace to watch (repeatable, default: all)",
+    )
+    parser.add_argument("--checks", help="Comma-separated rule ids to run (default: all)")
+    parser.add_argument("--listen", default="127.0.0.1", help="Address for the metrics endpoint")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port for the metrics endpoint")
+    parser.add_argument(
+        "--sweep",
+        type=float,
+        default=SWEEP_SECONDS,
+        metavar="SECONDS",
+        help="How often to re-run time-windowed event rules",
+    )
+    parser.add_argument("--quiet", action="store_true", help="Do not log new and resolved findings")
+    args = parser.parse_args()
+
+    # Capacity and cluster rules need totals over every pod; they are left to
+    # the one-shot k8s_health_check run.
+    rules = [r for r in select_rules(parser, args.checks) if r.scope not in NODE_TOTAL_SCOPES]
+    if args.sweep <= 0:
+        parser.error("--sweep must be a positive number of seconds")
+
+    load_kube_config()
+    v1 = get_core_v1_api()
+
+    findings = FindingSet(rules, log=not args.quiet)
+    caches = start_caches(v1, findings, args.namespaces)
+
+    server = ThreadingHTTPServer((args.listen, args.port), make_handler(findings, caches))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print_result("OK", f"Serving metrics on http://{args.listen}:{args.port}/metrics")
+    sys.stdout.flush()
+
+    stopped = threading.Event()
+    try:
+        while not stopped.wait(args.sweep):
+            for cache in caches["Event"]:
+                for ev in cache.items():
+                    findings.update("Event", "MODIFIED", ev)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        for kind_caches in caches.values():
+            for cache in kind_caches:
+                cache.stop()
+
+
+if __name__ == "__main__":
+    main()
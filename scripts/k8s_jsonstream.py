@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+"""
+Incremental decoding of large Kubernetes JSON lists.
+
+`kubectl get ... -o json` and the API server return one JSON document
+whose "items" array holds every object. iter_list_items() reads such a
+document from an iterable of byte chunks and yields the items one at a
+time, so peak memory is bounded by the chunk size plus the largest single
+item instead of the whole document (and its decoded copies).
+
+Chunks can come from a memory-mapped file (iter_file_chunks), a gzip
+stream or a subprocess pipe. Only the standard library is needed.
+"""
+
+import codecs
+import gzip
+import json
+import mmap
+import re
+from typing import Any, BinaryIO, Iterable, Iterator
+
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class _Reader:
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        # Append at least as much text as is still unread, so a value that
+        # spans many chunks is re-scanned a logarithmic number of times.
+        if self.eof:
+            return False
+        unread = self.buf[self.pos:]
+        parts = [unread]
+        added = 0
+        while added < max(len(unread), 1):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                parts.append(self._utf8.decode(b"", final=True))
+                self.eof = True
+                break
+            text = self._utf8.decode(bytes(chunk))
+            parts.append(text)
+            added += len(text)
+        self.buf = "".join(parts)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"expected one of {chars!r} but found {ch or 'end of input'!r}")
+        self.pos += 1
+        return ch
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A value that ends at the buffer end may continue in the next
+            # chunk. So may a number followed by the start of a fraction or
+            # exponent ("1." + "5", "1e" + "3", "1e+" + "3"), which
+            # raw_decode stops short of.
+            tail = len(self.buf) - end
+            is_number = isinstance(obj, (int, float)) and not isinstance(obj, bool)
+            if (tail == 0 or (is_number and tail <= 2)) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_list_items(chunks: Iterable[bytes], key: str = "items") -> Iterator[Any]:
+    # Accepts either an object with a `key` array (a List) or a bare array.
+    reader = _Reader(chunks)
+    if reader.peek() == "[":
+        yield from _iter_array(reader)
+        return
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            yield from _iter_array(reader)
+        else:
+            reader.value()
+        if reader.expect(",}") == "}":
+            return
+
+
+def _iter_array(reader: _Reader) -> Iterator[Any]:
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.value()
+        if reader.expect(",]") == "]":
+            return
+
+
+def iter_stream_chunks(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    return iter(lambda: stream.read(chunk_size), b"")
+
+
+def iter_file_chunks(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    # Plain files are memory-mapped; .gz files are decompressed as a stream.
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            yield from iter_stream_chunks(f, chunk_size)
+        return
+
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped.
+            return
+        with mm:
+            for offset in range(0, len(mm), chunk_size):
+                yield mm[offset:offset + chunk_size]
+
+
+def iter_file_lines(path: str) -> Iterator[bytes]:
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            yield from f
+        return
+
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return
+        with mm:
+            yield from iter(mm.readline, b"")
@@ -1,91 +1,66 @@
-import subprocess
-import json
-import datetime as dt
-import shlex
+import argparse
 
-def execute_kube_command_json(command):
-    # Split command safely instead of using shell=True
-    command_parts = shlex.split(command)
-    kube_command = subprocess.run(
-        command_parts,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        check=False,
-        shell=False
-    )
-    if kube_command.returncode != 0:
-        raise RuntimeError(f"Command failed: {command}\nError: {kube_command.stderr.decode('utf-8')}")
-    json_output = kube_command.stdout.decode("utf-8")
-    json_object = json.loads(json_output)
-    return json_object
+from k8s_audit import (
+    add_output_arguments,
+    add_source_arguments,
+    check_source_arguments,
+    open_source,
+    resource_status,
+    run_audit,
+    write_audit,
+)
 
-audit_report = {}
-command = "kubectl get namespaces -o json"
-json_object = execute_kube_command_json(command)
-number_of_namespaces = len(json_object["items"])
-processed_namespace_count = 1
+try:
+    from k8s_rightsizing import DEFAULT_INTERVAL_SECONDS, DEFAULT_WINDOW, parse_duration, recommend
+except ImportError:
+    recommend = None
+    DEFAULT_INTERVAL_SECONDS, DEFAULT_WINDOW = 15.0, "10m"
 
-for namespace in json_object["items"]:
-    process_start = dt.datetime.now()
-    print("Processing Namespace", processed_namespace_count, "of", number_of_namespaces)
-    namespace_name=namespace["metadata"]["name"]
-    command = "kubectl get pods -n {namespace} -o json".format(namespace=namespace_name)
-    json_object = execute_kube_command_json(command)
-    audit_report[namespace_name] = {}
-    if not json_object["items"]:
-        processed_namespace_count += 1
-        process_end = dt.datetime.now()
-        if (process_end - process_start).total_seconds() > 0:
-            how_long_to_finish = float(number_of_namespaces - processed_namespace_count) / (process_end - process_start).total_seconds() / 60
-            if how_long_to_finish < 1:
-                how_long_to_finish = how_long_to_finish * 60
-                print(how_long_to_finish, "seconds")
-            else:
-                print(how_long_to_finish, "minutes")
-        else:
-            print("Calculating time remaining...")
-        continue
-    else:
-        for pod in json_object["items"]:
-            audit_report[namespace_name][pod["metadata"]["name"]] = {}
-            for container in pod["spec"]["containers"]:
-                audit_report[namespace_name][pod["metadata"]["name"]][container["name"]] = {}
-                if "resources" in container:
-                    if "requests" in container["resources"] and "limits" in container["resources"]:
-                        audit_report[namespace_name][pod["metadata"]["name"]][container["name"]] = {
-                            "requests": "present",
-                            "limits": "present"
-                        }
-                    elif "limits" in container["resources"] and "requests" not in container["resources"]:
-                        audit_report[namespace_name][pod["metadata"]["name"]][container["name"]] = {
-                            "requests": "not present",
-                            "limits": "present"
-                        }
-                    elif "limits" not in container["resources"] and "requests" in container["resources"]:
-                        audit_report[namespace_name][pod["metadata"]["name"]][container["name"]] = {
-                            "requests": "present",
-                            "limits": "not present"
-                        }
-                    else:
-                        audit_report[namespace_name][pod["metadata"]["name"]][container["name"]] = {
-                            "requests": "not present",
-                            "limits": "not present"
-                        }
-                else:
-                    audit_report[namespace_name][pod["metadata"]["name"]][container["name"]] = {
-                        "requests": "not present",
-                        "limits": "not present"
-                    }
-    processed_namespace_count += 1
-    process_end = dt.datetime.now()
-    if (process_end - process_start).total_seconds() > 0:
-        how_long_to_finish = float(number_of_namespaces - processed_namespace_count) / (process_end - process_start).total_seconds() / 60
-        if how_long_to_finish < 1:
-            how_long_to_finish = how_long_to_finish * 60
-            print(how_long_to_finish, "seconds")
-        else:
-            print(how_long_to_finish, "minutes")
+# Requests/limits audit: one pass over every pod in the cluster (see k8s_audit).
+# With --recommend, samples metrics.k8s.io usage for --window and prints
+# p50/p95/p99 CPU/memory per workload container next to the current
+# requests and limits (see k8s_rightsizing).
+
+parser = argparse.ArgumentParser(description="Audit resource requests/limits of every container")
+add_source_arguments(parser)
+add_output_arguments(parser)
+parser.add_argument(
+    "--recommend", action="store_true", help="Sample pod usage and recommend requests/limits per workload"
+)
+parser.add_argument(
+    "--window",
+    default=DEFAULT_WINDOW,
+    help=f"How long to sample usage with --recommend, e.g. 30m, 2h (default: {DEFAULT_WINDOW})",
+)
+parser.add_argument(
+    "--interval",
+    type=float,
+    default=DEFAULT_INTERVAL_SECONDS,
+    metavar="SECONDS",
+    help=f"Seconds between usage samples with --recommend (default: {DEFAULT_INTERVAL_SECONDS:g})",
+)
+args = parser.parse_args()
+check_source_arguments(parser, args)
+
+if args.recommend:
+    if recommend is None:
+        parser.error("--recommend needs the kubernetes package")
+    if args.snapshot or args.kubectl:
+        parser.error("--recommend reads metrics.k8s.io and needs the python client against a live cluster")
+    if args.output == "parquet":
+        parser.error("--recommend supports --output text, ndjson or csv")
+    if args.interval <= 0:
+        parser.error("--interval must be a positive number of seconds")
+    try:
+        window = parse_duration(args.window)
+    except ValueError as exc:
+        parser.error(str(exc))
+    recommend(args, window)
+else:
+    namespaces, pages = open_source(args)
+    if args.output != "text":
+        write_audit(args, {"resources": resource_status}, pages)
     else:
-        print("Calculating time remaining...")
+        audit_report = run_audit({"resources": resource_status}, namespaces, pages)["resources"]
 
-print(audit_report)
+        print(audit_report)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""
+Kubernetes resource quantity parsing shared by the k8s_* scripts.
+
+Quantities are parsed exactly into integer milli-units (the same rounding
+as resource.Quantity.MilliValue(): fractions are rounded up), so "100m"
+is 100, "1" is 1000 and "1Ki" is 1024000. Supported forms:
+
+  * plain and decimal numbers: 1, 0.5, .5
+  * decimal SI suffixes: n, u, m, k, M, G, T, P, E (and K for legacy input)
+  * binary suffixes: Ki, Mi, Gi, Ti, Pi, Ei
+  * decimal exponents: 1e3, 1E-3
+
+Single values are memoized. The batch helpers return NumPy int64 arrays
+when NumPy is installed and array('q') otherwise; int64 milli-units cover
+values up to about 9.2e15 base units (9.2 PB of memory).
+"""
+
+import re
+from array import array
+from fractions import Fraction
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_BINARY_SUFFIXES = {
+    "Ki": 2**10,
+    "Mi": 2**20,
+    "Gi": 2**30,
+    "Ti": 2**40,
+    "Pi": 2**50,
+    "Ei": 2**60,
+}
+
+_DECIMAL_SUFFIXES = {
+    "n": Fraction(1, 10**9),
+    "u": Fraction(1, 10**6),
+    "m": Fraction(1, 10**3),
+    "": Fraction(1),
+    "k": Fraction(10**3),
+    "K": Fraction(10**3),
+    "M": Fraction(10**6),
+    "G": Fraction(10**9),
+    "T": Fraction(10**12),
+    "P": Fraction(10**15),
+    "E": Fraction(10**18),
+}
+
+_QUANTITY_RE = re.compile(
+    r"^([+-]?(?:\d+\.?\d*|\.\d+))(?:[eE]([+-]?\d+)|(Ki|Mi|Gi|Ti|Pi|Ei|[numkKMGTPE]))?$"
+)
+
+PARSE_CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_milli(q: str) -> int:
+    match = _QUANTITY_RE.match(q)
+    if not match:
+        raise ValueError(f"invalid quantity: {q!r}")
+
+    number, exponent, suffix = match.groups()
+    value = Fraction(number)
+    if exponent is not None:
+        value *= Fraction(10) ** int(exponent)
+    elif suffix in _BINARY_SUFFIXES:
+        value *= _BINARY_SUFFIXES[suffix]
+    else:
+        value *= _DECIMAL_SUFFIXES[suffix or ""]
+
+    milli = value * 1000
+    return -((-milli.numerator) // milli.denominator)
+
+
+def milli_value(q: Optional[str]) -> int:
+    if q is None:
+        return 0
+    q = str(q).strip()
+    if not q:
+        return 0
+    return _parse_milli(q)
+
+
+def value(q: Optional[str]) -> int:
+    return -((-milli_value(q)) // 1000)
+
+
+def milli_values(quantities: Iterable[Optional[str]]):
+    parsed = (milli_value(q) for q in quantities)
+    if np is not None:
+        return np.fromiter(parsed, dtype=np.int64)
+    return array("q", parsed)
+
+
+def sum_milli_groups(quantities: Sequence[Optional[str]], offsets: Sequence[int]) -> List[int]:
+    # offsets has one more entry than there are groups: group i covers
+    # quantities[offsets[i]:offsets[i + 1]].
+    values = milli_values(quantities)
+    if np is not None:
+        cumulative = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+        bounds = np.asarray(offsets, dtype=np.int64)
+        return (cumulative[bounds[1:]] - cumulative[bounds[:-1]]).tolist()
+    return [sum(values[start:end]) for start, end in zip(offsets, offsets[1:])]
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+"""
+Raw-JSON access to the Kubernetes API shared by the k8s_* scripts.
+
+The typed client methods build a V1Pod/V1Node/... object graph for every
+item they return, which on large lists costs more CPU than the transfer
+itself. The helpers here call the same API methods with
+_preload_content=False and decode the body straight into plain dicts
+(with orjson when it is installed), so callers only touch the fields they
+read. Field names are the API's camelCase keys, e.g. pod["spec"]["nodeName"].
+"""
+
+import datetime
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from kubernetes.client import ApiException
+from kubernetes.watch.watch import iter_resp_lines
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:
+    import json
+
+    loads = json.loads
+
+PAGE_SIZE = 500
+WATCH_TIMEOUT_SECONDS = 300
+WATCH_RETRY_SECONDS = 5.0
+ERROR_POLL_SECONDS = 0.2
+
+# Pass as _headers= to a list call to get only each item's metadata
+# (PartialObjectMetadataList). Servers that cannot do that fall back to
+# the full objects; either way items have the usual "metadata" key.
+METADATA_ONLY_HEADERS = {"Accept": "application/json;as=PartialObjectMetadataList;v=v1;g=meta.k8s.io,application/json"}
+
+
+class CacheSyncError(RuntimeError):
+    pass
+
+
+def describe_error(error: BaseException) -> str:
+    # ApiException's str() carries every response header and the body.
+    if isinstance(error, ApiException):
+        return f"({error.status}) {error.reason}"
+    return str(error) or type(error).__name__
+
+
+def list_raw(list_func: Callable[..., Any], **kwargs: Any) -> Dict:
+    resp = list_func(_preload_content=False, **kwargs)
+    try:
+        return loads(resp.data)
+    finally:
+        resp.release_conn()
+
+
+def read_raw(read_func: Callable[..., Any], **kwargs: Any) -> Dict:
+    return list_raw(read_func, **kwargs)
+
+
+def iter_pages_raw(
+    list_func: Callable[..., Any], page_size: Optional[int] = PAGE_SIZE, **kwargs: Any
+) -> Iterator[Dict]:
+    if page_size:
+        kwargs["limit"] = page_size
+    while True:
+        page = list_raw(list_func, **kwargs)
+        yield page
+        token = page.get("metadata", {}).get("continue")
+        if not token:
+            return
+        kwargs["_continue"] = token
+
+
+def paginate_raw(
+    list_func: Callable[..., Any], page_size: Optional[int] = PAGE_SIZE, **kwargs: Any
+) -> Iterator[Dict]:
+    for page in iter_pages_raw(list_func, page_size, **kwargs):
+        yield from page.get("items") or []
+
+
+def parse_time(value: Optional[str]) -> Optional[datetime.datetime]:
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def object_key(obj: Dict) -> Tuple[str, str]:
+    meta = obj["metadata"]
+    return meta.get("namespace") or "", meta["name"]
+
+
+class ResourceCache:
+    # List once, then keep the store current from a watch. The store is
+    # indexed by namespace ("" for cluster-scoped objects) and name, and
+    # the watch resumes from the last seen resourceVersion. A 410 Gone
+    # means our resourceVersion was compacted away, so we relist.
+    #
+    # on_change, if given, is called from the cache thread after the store
+    # is updated, as on_change(event_type, obj) with "ADDED", "MODIFIED" or
+    # "DELETED". A relist reports every listed object as MODIFIED and the
+    # objects that disappeared meanwhile as DELETED.
+    #
+    # The thread retries failed lists and watches forever; the most recent
+    # failure is kept in `error` until a list succeeds again.
+    # ensure_primed()/ensure_synced() raise it instead of waiting out the
+    # timeout.
+
+    def __init__(
+        self,
+        list_func: Callable[..., Any],
+        page_size: Optional[int] = PAGE_SIZE,
+        on_change: Optional[Callable[[str, Dict], None]] = None,
+        **list_kwargs: Any,
+    ):
+        self._list_func = list_func
+        self._page_size = page_size
+        self._on_change = on_change
+        self._list_kwargs = list_kwargs
+        self._store: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+        self._resource_version: Optional[str] = None
+        self._primed = threading.Event()
+        self._synced = threading.Event()
+        self._stopped = threading.Event()
+        self._resp = None
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        resp = self._resp
+        if resp is not None:
+            resp.close()
+
+    def wait_synced(self, timeout: Optional[float] = None) -> bool:
+        return self._synced.wait(timeout)
+
+    def wait_primed(self, timeout: Optional[float] = None) -> bool:
+        return self._primed.wait(timeout)
+
+    def _ensure(self, event: threading.Event, timeout: Optional[float]) -> None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not event.wait(ERROR_POLL_SECONDS):
+            error = self._error
+            if error is not None:
+                name = getattr(self._list_func, "__name__", "list")
+                raise CacheSyncError(f"{name} failed: {describe_error(error)}") from error
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"list did not complete within {timeout:g}s")
+
+    def ensure_synced(self, timeout: Optional[float] = None) -> None:
+        self._ensure(self._synced, timeout)
+
+    def ensure_primed(self, timeout: Optional[float] = None) -> None:
+        self._ensure(self._primed, timeout)
+
+    @property
+    def synced(self) -> bool:
+        return self._synced.is_set()
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        return self._error
+
+    def items(self, namespace: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            if namespace is not None:
+                return list(self._store.get(namespace, {}).values())
+            return [obj for objs in self._store.values() for obj in objs.values()]
+
+    def _relist(self) -> None:
+        # The first list fills the live store page by page so readers can
+        # paint before it completes; later relists swap in a new store.
+        # If the first list fails partway, the retry fills the same live
+        # store, so objects it no longer returns are dropped at the end.
+        initial = not self._synced.is_set()
+        store: Dict[str, Dict[str, Dict]] = self._store if initial else {}
+        seen: Set[Tuple[str, str]] = set()
+
+        resource_version = None
+        for page in iter_pages_raw(self._list_func, self._page_size, **self._list_kwargs):
+            if resource_version is None:
+                resource_version = page["metadata"].get("resourceVersion")
+            items = page.get("items") or []
+            with self._lock:
+                for obj in items:
+                    ns, name = object_key(obj)
+                    store.setdefault(ns, {})[name] = obj
+                    if initial:
+                        seen.add((ns, name))
+            self._primed.set()
+            if self._on_change is not None:
+                for obj in items:
+                    self._on_change("ADDED" if initial else "MODIFIED", obj)
+
+        stale: List[Dict] = []
+        with self._lock:
+            if initial:
+                for ns, objs in store.items():
+                    for name in [n for n in objs if (ns, n) not in seen]:
+                        stale.append(objs.pop(name))
+            old = self._store
+            self._store = store
+            self._resource_version = resource_version
+            self._error = None
+        self._synced.set()
+
+        if self._on_change is not None:
+            if not initial:
+                for ns, objs in old.items():
+                    current = store.get(ns, {})
+                    stale.extend(obj for name, obj in objs.items() if name not in current)
+            for obj in stale:
+                self._on_change("DELETED", obj)
+
+    def _apply(self, event_type: str, obj: Dict) -> None:
+        ns, name = object_key(obj)
+        with self._lock:
+            if event_type == "DELETED":
+                objs = self._store.get(ns)
+                if objs is not None:
+                    objs.pop(name, None)
+            elif event_type in ("ADDED", "MODIFIED"):
+                self._store.setdefault(ns, {})[name] = obj
+            self._resource_version = obj["metadata"].get("resourceVersion")
+        if self._on_change is not None:
+            self._on_change(event_type, obj)
+
+    def _watch_once(self) -> None:
+        self._resp = self._list_func(
+            watch=True,
+            resource_version=self._resource_version,
+            timeout_seconds=WATCH_TIMEOUT_SECONDS,
+            allow_watch_bookmarks=True,
+            _preload_content=False,
+            **self._list_kwargs,
+        )
+        try:
+            for line in iter_resp_lines(self._resp):
+                if self._stopped.is_set():
+                    return
+                if not line:
+                    continue
+                event = loads(line)
+                event_type = event["type"]
+                obj = event["object"]
+                if event_type == "ERROR":
+                    if obj.get("code") == 410:
+                        self._resource_version = None
+                        return
+                    raise ApiException(status=obj.get("code"), reason=obj.get("message"))
+                if event_type == "BOOKMARK":
+                    self._resource_version = obj["metadata"].get("resourceVersion")
+                    continue
+                self._apply(event_type, obj)
+        finally:
+            self._resp.release_conn()
+            self._resp = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                if self._resource_version is None:
+                    self._relist()
+                self._watch_once()
+            except ApiException as e:
+                if e.status == 410:
+                    self._resource_version = None
+                    continue
+                self._error = e
+                self._stopped.wait(WATCH_RETRY_SECONDS)
+            except Exception as e:
+                self._error = e
+                self._stopped.wait(WATCH_RETRY_SECONDS)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+
+"""
+Right-sizing recommendations for container requests and limits.
+
+Samples metrics.k8s.io pod usage every --interval seconds for --window and
+feeds each container's CPU and memory usage into fixed-size quantile
+sketches (see k8s_sketch). Replicas share the sketches of their workload
+owner (Deployment, StatefulSet, DaemonSet, CronJob, ... resolved like
+k8s_health_check does), so memory grows with the number of distinct
+workload containers, not with pods or samples.
+
+The report lists p50/p95/p99 usage next to the current requests and
+limits, as candidates for the new values. A sample is only counted when
+metrics-server reports a new timestamp for the pod, so an interval shorter
+than its resolution does not count the same scrape twice.
+
+Used by k8s_limits_requests.py --recommend.
+"""
+
+import argparse
+import math
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from kubernetes import client
+from kubernetes.client import ApiException
+
+from k8s_audit import RECORD_WRITERS, load_api_client, open_source
+from k8s_health_check import Owner, OwnerIndex
+from k8s_quantity import milli_value, value
+from k8s_raw import list_raw, read_raw
+from k8s_sketch import KllSketch
+
+METRICS_GROUP = "metrics.k8s.io"
+METRICS_VERSION = "v1beta1"
+QUANTILES = (0.5, 0.95, 0.99)
+DEFAULT_WINDOW = "10m"
+DEFAULT_INTERVAL_SECONDS = 15.0
+
+RECOMMEND_COLUMNS = [
+    "kind",
+    "namespace",
+    "name",
+    "container",
+    "pods",
+    "samples",
+    "cpu_request_m",
+    "cpu_limit_m",
+    "cpu_p50_m",
+    "cpu_p95_m",
+    "cpu_p99_m",
+    "memory_request_bytes",
+    "memory_limit_bytes",
+    "memory_p50_bytes",
+    "memory_p95_bytes",
+    "memory_p99_bytes",
+]
+
+_DURATION_RE = re.compile(r"^(\d+(?:\.\d+)?)([smhd]?)$")
+_DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text: str) -> float:
+    match = _DURATION_RE.match(text.strip())
+    if not match:
+        raise ValueError(f"invalid duration: {text!r} (use e.g. 90s, 10m, 2h)")
+    return float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+def format_cpu(milli: Optional[int]) -> str:
+    if milli is None:
+        return "-"
+    if milli >= 1000 and milli % 100 == 0:
+        return f"{milli / 1000:g}"
+    return f"{milli}m"
+
+
+def format_memory(size: Optional[int]) -> str:
+    if size is None:
+        return "-"
+    return f"{math.ceil(size / 2**20)}Mi"
+
+
+@dataclass
+class ContainerUsage:
+    owner: Owner
+    container: str
+    cpu: KllSketch = field(default_factory=KllSketch)
+    memory: KllSketch = field(default_factory=KllSketch)
+    pods: int = 0
+    # Current values from the most recently seen pod spec: CPU in
+    # millicores, memory in bytes, None when not set.
+    cpu_request: Optional[int] = None
+    cpu_limit: Optional[int] = None
+    memory_request: Optional[int] = None
+    memory_limit: Optional[int] = None
+
+
+def _quantity(resources: Dict[str, Any], section: str, name: str, parse: Callable[[str], int]) -> Optional[int]:
+    q = (resources.get(section) or {}).get(name)
+    return parse(q) if q is not None else None
+
+
+class Recommender:
+    def __init__(self, owners: OwnerIndex, read_pod: Optional[Callable[[str, str], Dict[str, Any]]] = None):
+        self._owners = owners
+        self._read_pod = read_pod
+        self._pods: Dict[Tuple[str, str], Owner] = {}
+        self._stamps: Dict[Tuple[str, str], str] = {}
+        self._usage: Dict[Tuple[Owner, str], ContainerUsage] = {}
+
+    def _entry(self, owner: Owner, container: str) -> ContainerUsage:
+        key = (owner, container)
+        usage = self._usage.get(key)
+        if usage is None:
+            usage = self._usage[key] = ContainerUsage(owner, container)
+        return usage
+
+    def add_pod(self, pod: Dict[str, Any]) -> Owner:
+        meta = pod["metadata"]
+        key = (meta["namespace"], meta["name"])
+        owner = self._owners.owner(pod) or ("Pod", meta["namespace"], meta["name"], meta.get("uid"))
+        first = key not in self._pods
+        self._pods[key] = owner
+        for container in pod["spec"]["containers"]:
+            usage = self._entry(owner, container["name"])
+            resources = container.get("resources") or {}
+            usage.cpu_request = _quantity(resources, "requests", "cpu", milli_value)
+            usage.cpu_limit = _quantity(resources, "limits", "cpu", milli_value)
+            usage.memory_request = _quantity(resources, "requests", "memory", value)
+            usage.memory_limit = _quantity(resources, "limits", "memory", value)
+            if first:
+                usage.pods += 1
+        return owner
+
+    def _pod_owner(self, namespace: str, name: str) -> Optional[Owner]:
+        owner = self._pods.get((namespace, name))
+        if owner is None and self._read_pod is not None:
+            # Started after the initial list (rollout, scale-up, new job).
+            try:
+                owner = self.add_pod(self._read_pod(name, namespace))
+            except ApiException:
+                return None
+        return owner
+
+    def add_metrics(self, items: List[Dict[str, Any]]) -> int:
+        added = 0
+        for item in items:
+            meta = item["metadata"]
+            key = (meta["namespace"], meta["name"])
+            stamp = item.get("timestamp") or ""
+            if self._stamps.get(key) == stamp:
+                continue
+            owner = self._pod_owner(*key)
+            if owner is None:
+                continue
+            self._stamps[key] = stamp
+            for container in item.get("containers") or []:
+                usage = container.get("usage") or {}
+                entry = self._entry(owner, container["name"])
+                entry.cpu.update(milli_value(usage.get("cpu")))
+                entry.memory.update(value(usage.get("memory")))
+                added += 1
+        return added
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        # Sorted by namespace, owner name, kind and container.
+        for usage in sorted(self._usage.values(), key=lambda u: (u.owner[1], u.owner[2], u.owner[0], u.container)):
+            if usage.cpu.count == 0:
+                continue
+            kind, namespace, name, _ = usage.owner
+            record = {
+                "kind": kind,
+                "namespace": namespace,
+                "name": name,
+                "container": usage.container,
+                "pods": usage.pods,
+                "samples": usage.cpu.count,
+                "cpu_request_m": usage.cpu_request,
+                "cpu_limit_m": usage.cpu_limit,
+                "memory_request_bytes": usage.memory_request,
+                "memory_limit_bytes": usage.memory_limit,
+            }
+            for q, cpu, memory in zip(QUANTILES, usage.cpu.quantiles(QUANTILES), usage.memory.quantiles(QUANTILES)):
+                suffix = f"p{round(q * 100)}"
+                record[f"cpu_{suffix}_m"] = math.ceil(cpu)
+                record[f"memory_{suffix}_bytes"] = math.ceil(memory)
+            yield record
+
+
+def metrics_fetcher(custom: client.CustomObjectsApi, namespaces: Optional[List[str]]) -> Callable[[], List[Dict]]:
+    def fetch() -> List[Dict]:
+        if namespaces is None:
+            return list_raw(
+                custom.list_cluster_custom_object, group=METRICS_GROUP, version=METRICS_VERSION, plural="pods"
+            ).get("items") or []
+        items: List[Dict] = []
+        for ns in namespaces:
+            items.extend(
+                list_raw(
+                    custom.list_namespaced_custom_object,
+                    group=METRICS_GROUP,
+                    version=METRICS_VERSION,
+                    namespace=ns,
+                    plural="pods",
+                ).get("items")
+                or []
+            )
+        return items
+
+    return fetch
+
+
+def sample(
+    recommender: Recommender,
+    fetch: Callable[[], List[Dict]],
+    window: float,
+    interval: float,
+    progress: bool = True,
+) -> int:
+    deadline = time.monotonic() + window
+    rounds = 0
+    while True:
+        started = time.monotonic()
+        added = recommender.add_metrics(fetch())
+        rounds += 1
+        left = deadline - time.monotonic()
+        if progress:
+            print(f"Sample {rounds}: {added} new container samples, {max(left, 0):.0f}s left", file=sys.stderr)
+        if left <= 0:
+            return rounds
+        time.sleep(min(max(interval - (time.monotonic() - started), 0.0), left))
+
+
+def print_recommendations(records: Iterator[Dict[str, Any]]) -> None:
+    owner = None
+    for r in records:
+        if (r["kind"], r["namespace"], r["name"]) != owner:
+            owner = (r["kind"], r["namespace"], r["name"])
+            print(f"{r['kind']} {r['namespace']}/{r['name']}")
+        print(f"  {r['container']} ({r['pods']} pods, {r['samples']} samples)")
+        print(
+            f"    cpu     request {format_cpu(r['cpu_request_m']):>7}  limit {format_cpu(r['cpu_limit_m']):>7}"
+            f"  p50 {format_cpu(r['cpu_p50_m']):>7}  p95 {format_cpu(r['cpu_p95_m']):>7}"
+            f"  p99 {format_cpu(r['cpu_p99_m']):>7}"
+        )
+        print(
+            f"    memory  request {format_memory(r['memory_request_bytes']):>7}"
+            f"  limit {format_memory(r['memory_limit_bytes']):>7}"
+            f"  p50 {format_memory(r['memory_p50_bytes']):>7}  p95 {format_memory(r['memory_p95_bytes']):>7}"
+            f"  p99 {format_memory(r['memory_p99_bytes']):>7}"
+        )
+
+
+def recommend(args: argparse.Namespace, window: float) -> None:
+    api_client = load_api_client(args.concurrency)
+    v1 = client.CoreV1Api(api_client)
+    scoped = bool(args.per_namespace or args.namespaces)
+    recommender = Recommender(
+        OwnerIndex.live(api_client, all_namespaces=not scoped),
+        lambda name, namespace: read_raw(v1.read_namespaced_pod, name=name, namespace=namespace),
+    )
+
+    namespaces, pages = open_source(args)
+    for page in pages:
+        for pod in page.pods:
+            recommender.add_pod(pod)
+
+    fetch = metrics_fetcher(client.CustomObjectsApi(api_client), namespaces if scoped else None)
+    sample(recommender, fetch, window, args.interval)
+
+    if args.output == "text":
+        print_recommendations(recommender.records())
+        return
+    out = open(args.output_file, "w", newline="", encoding="utf-8") if args.output_file else sys.stdout
+    writer = RECORD_WRITERS[args.output](out, RECOMMEND_COLUMNS)
+    try:
+        for record in recommender.records():
+            writer.write(record)
+    finally:
+        writer.close()
+        if out is not sys.stdout:
+            out.close()
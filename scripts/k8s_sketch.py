@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""
+Fixed-size streaming quantile sketch (KLL) shared by the k8s_* scripts.
+
+A KllSketch keeps a stack of compactors: level h holds items that each
+stand for 2**h samples. When the sketch is full, the lowest full level is
+sorted and every other item (random odd/even offset) is promoted to the
+next level, halving its size. Level capacities shrink geometrically from
+the top, so the sketch holds about 3 * k values however many samples it
+has seen, and rank error is roughly 1.7 / k (about 1% for the default k).
+
+Sketches with the same k can be merged, e.g. the per-pod sketches of one
+workload or the results of runs over separate namespaces. Values are kept
+in array('d') buffers, so each stored value costs 8 bytes. Only the
+standard library is needed.
+"""
+
+import math
+import random
+from array import array
+from typing import Iterable, List, Optional
+
+DEFAULT_K = 200
+_CAPACITY_RATIO = 2.0 / 3.0
+
+
+class KllSketch:
+    __slots__ = ("k", "count", "min", "max", "_levels", "_size", "_max_size")
+
+    def __init__(self, k: int = DEFAULT_K):
+        if k < 8:
+            raise ValueError("k must be at least 8")
+        self.k = k
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._levels: List[array] = [array("d")]
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - level - 1
+        return max(2, int(self.k * _CAPACITY_RATIO**depth))
+
+    def _grow(self) -> None:
+        self._levels.append(array("d"))
+        self._max_size = sum(self._capacity(h) for h in range(len(self._levels)))
+
+    def update(self, value: float) -> None:
+        self._levels[0].append(value)
+        self._size += 1
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if self._size >= self._max_size:
+            self._compress()
+
+    def extend(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.update(value)
+
+    def _compress(self) -> None:
+        for h in range(len(self._levels)):
+            if len(self._levels[h]) < self._capacity(h):
+                continue
+            if h + 1 == len(self._levels):
+                self._grow()
+            items = sorted(self._levels[h])
+            # An odd item out stays behind so the total weight is preserved.
+            kept = [items.pop()] if len(items) % 2 else []
+            self._levels[h + 1].extend(items[random.getrandbits(1)::2])
+            self._levels[h] = array("d", kept)
+            self._size = sum(len(level) for level in self._levels)
+            if self._size < self._max_size:
+                return
+
+    def merge(self, other: "KllSketch") -> None:
+        if other.k != self.k:
+            raise ValueError(f"cannot merge sketches with k={self.k} and k={other.k}")
+        while len(self._levels) < len(other._levels):
+            self._grow()
+        for level, items in zip(self._levels, other._levels):
+            level.extend(items)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._size = sum(len(level) for level in self._levels)
+        while self._size >= self._max_size:
+            before = self._size
+            self._compress()
+            if self._size == before:
+                break
+
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        # One sort for all requested quantiles; q=0 and q=1 are the exact
+        # min and max.
+        qs = list(qs)
+        if self.count == 0:
+            return [None for _ in qs]
+        weighted = sorted((value, 1 << h) for h, level in enumerate(self._levels) for value in level)
+        total = sum(weight for _, weight in weighted)
+        result: List[Optional[float]] = []
+        for q in qs:
+            if q <= 0:
+                result.append(self.min)
+                continue
+            if q >= 1:
+                result.append(self.max)
+                continue
+            target = q * total
+            cumulative = 0
+            found = self.max
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    found = value
+                    break
+            result.append(found)
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles((q,))[0]
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+"""
+Offline cluster snapshots for the k8s_* scripts.
+
+A snapshot is either:
+
+- a directory of `kubectl get <resource> -A -o json` lists, one file per
+  resource: namespaces.json, pods.json, nodes.json, events.json,
+  ciliumnetworkpolicies.json and optionally replicasets.json / jobs.json
+  (used to resolve pod owners). Each file may also be gzipped (.json.gz).
+- a single NDJSON bundle (.ndjson or .ndjson.gz) with one object per line;
+  each object carries its "kind". Bundles written by convert() start with
+  a {"kind": "SnapshotInfo", "capturedAt": ...} header line.
+
+Snapshot mirrors the fetch functions the scripts use against a live
+cluster. Files are read lazily: plain files are memory-mapped and list
+items are decoded one at a time (see k8s_jsonstream), so memory stays
+bounded by the largest object even for 100k-pod dumps.
+
+The capture time anchors time windows such as the health check's recent
+events. It comes from the bundle header, or else from the newest event
+(or object creation) timestamp in the dump, so copying or converting the
+files does not move it.
+
+Recording a snapshot from the current kubectl context:
+  mkdir snap && for r in namespaces pods nodes events ciliumnetworkpolicies replicasets jobs; do
+    kubectl get "$r" -A -o json > "snap/$r.json"; done
+  python3 k8s_snapshot.py snap snap.ndjson.gz    # optional: pack into one bundle
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from k8s_jsonstream import iter_file_chunks, iter_file_lines, iter_list_items
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+INFO_KIND = "SnapshotInfo"
+
+# kind -> resource name used for directory file names.
+RESOURCES = {
+    "Namespace": "namespaces",
+    "Pod": "pods",
+    "Node": "nodes",
+    "Event": "events",
+    "CiliumNetworkPolicy": "ciliumnetworkpolicies",
+    "ReplicaSet": "replicasets",
+    "Job": "jobs",
+}
+
+
+class Snapshot:
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"snapshot not found: {path}")
+        self.path = path
+        self.is_dir = os.path.isdir(path)
+
+    def __repr__(self) -> str:
+        return f"Snapshot({self.path!r})"
+
+    def _file(self, kind: str) -> Optional[str]:
+        base = os.path.join(self.path, RESOURCES[kind])
+        for candidate in (f"{base}.json", f"{base}.json.gz"):
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def objects(self, kind: str) -> Iterator[Dict[str, Any]]:
+        if self.is_dir:
+            path = self._file(kind)
+            if path is not None:
+                yield from iter_list_items(iter_file_chunks(path))
+            return
+
+        # Cheap substring test first so lines of other kinds are not decoded.
+        needle = kind.encode()
+        for line in iter_file_lines(self.path):
+            if needle not in line or not line.strip():
+                continue
+            obj = loads(line)
+            if obj.get("kind") == kind:
+                yield obj
+
+    def _info(self) -> Dict[str, Any]:
+        if self.is_dir:
+            return {}
+        for line in iter_file_lines(self.path):
+            if line.strip():
+                obj = loads(line)
+                return obj if obj.get("kind") == INFO_KIND else {}
+        return {}
+
+    def captured_at(self) -> datetime.datetime:
+        # Recorded capture time if the bundle has one; otherwise the newest
+        # event timestamp, then the newest creationTimestamp. The file
+        # modification time is only a last resort: copies, downloads and
+        # conversions change it.
+        recorded = _parse_time(self._info().get("capturedAt"))
+        if recorded is not None:
+            return recorded
+
+        for kinds in (("Event",), ("Pod", "Node", "Namespace")):
+            newest = None
+            for kind in kinds:
+                for obj in self.objects(kind):
+                    value = _event_time(obj) if kind == "Event" else obj["metadata"].get("creationTimestamp")
+                    stamp = _parse_time(value)
+                    if stamp is not None and (newest is None or stamp > newest):
+                        newest = stamp
+            if newest is not None:
+                return newest
+
+        path = self.path
+        if self.is_dir:
+            path = self._file("Event") or self._file("Pod") or self.path
+        return datetime.datetime.fromtimestamp(os.path.getmtime(path), datetime.timezone.utc)
+
+    def _namespaced(self, kind: str, namespace: Optional[str]) -> Iterator[Dict[str, Any]]:
+        if namespace is None:
+            return self.objects(kind)
+        return (obj for obj in self.objects(kind) if obj["metadata"].get("namespace") == namespace)
+
+    def namespaces(self) -> Iterator[Dict[str, Any]]:
+        return self.objects("Namespace")
+
+    def pods(self, namespace: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        return self._namespaced("Pod", namespace)
+
+    def nodes(self) -> Iterator[Dict[str, Any]]:
+        return self.objects("Node")
+
+    def events(self, namespace: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        return self._namespaced("Event", namespace)
+
+    def cilium_policies(self, namespace: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        return self._namespaced("CiliumNetworkPolicy", namespace)
+
+    def owner_readers(self) -> Dict[str, Callable[[str, str], Dict[str, Any]]]:
+        # Same shape as the live readers in k8s_health_check.OwnerIndex. Only
+        # ownerReferences are kept, indexed on first use.
+        readers = {}
+        for kind in ("ReplicaSet", "Job"):
+            readers[kind] = self._owner_reader(kind)
+        return readers
+
+    def _owner_reader(self, kind: str) -> Callable[[str, str], Dict[str, Any]]:
+        index: Optional[Dict[Tuple[str, str], List[Dict[str, Any]]]] = None
+
+        def read(name: str, namespace: str) -> Dict[str, Any]:
+            nonlocal index
+            if index is None:
+                index = {
+                    (obj["metadata"].get("namespace") or "", obj["metadata"]["name"]): obj["metadata"].get(
+                        "ownerReferences"
+                    )
+                    or []
+                    for obj in self.objects(kind)
+                }
+            refs = index[(namespace, name)]
+            return {"metadata": {"name": name, "namespace": namespace, "ownerReferences": refs}}
+
+        return read
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime.datetime]:
+    if not value:
+        return None
+    try:
+        stamp = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=datetime.timezone.utc)
+    return stamp
+
+
+def _event_time(event: Dict[str, Any]) -> Optional[str]:
+    # core/v1 and events.k8s.io/v1 field names.
+    series = event.get("series") or {}
+    return (
+        series.get("lastObservedTime")
+        or event.get("lastTimestamp")
+        or event.get("deprecatedLastTimestamp")
+        or event.get("eventTime")
+        or event["metadata"].get("creationTimestamp")
+    )
+
+
+def convert(src: Snapshot, out_path: str) -> Dict[str, int]:
+    # Writes any snapshot as an NDJSON bundle. Items of raw API lists carry
+    # no "kind", so it is filled in from the file they came from. The
+    # source's capture time goes into the header line.
+    counts: Dict[str, int] = {}
+    opener = gzip.open if out_path.endswith(".gz") else open
+    info = {"kind": INFO_KIND, "capturedAt": src.captured_at().isoformat()}
+    with opener(out_path, "wt", encoding="utf-8") as out:
+        out.write(json.dumps(info, separators=(",", ":")))
+        out.write("\n")
+        for kind in RESOURCES:
+            counts[kind] = 0
+            for obj in src.objects(kind):
+                obj.setdefault("kind", kind)
+                out.write(json.dumps(obj, separators=(",", ":")))
+                out.write("\n")
+                counts[kind] += 1
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert a kubectl dump directory into an NDJSON snapshot bundle")
+    parser.add_argument("source", help="Directory of `kubectl get -o json` lists")
+    parser.add_argument("output", help="Bundle to write (.ndjson or .ndjson.gz)")
+    args = parser.parse_args()
+
+    try:
+        counts = convert(Snapshot(args.source), args.output)
+    except (OSError, ValueError) as exc:
+        print(f"Could not convert snapshot: {exc}", file=sys.stderr)
+        sys.exit(1)
+    for kind, count in counts.items():
+        print(f"{RESOURCES[kind]}: {count}")
+
+
+if __name__ == "__main__":
+    main()
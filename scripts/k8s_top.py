@@ -1,237 +1,100 @@
 #!/usr/bin/env python3
 
 from textual.app import App, ComposeResult
-from textual.widgets import Header, Footer, DataTable, Static, TextLog, Select
+from textual.widgets import Header, Footer, DataTable, Input, Static, TextLog, Select
 from textual.containers import Horizontal, Vertical
+from textual.coordinate import Coordinate
 from textual.reactive import reactive
+from textual.widgets.data_table import CellDoesNotExist
 
-from dataclasses import dataclass
-from datetime import datetime, timezone
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 
-from kubernetes import client, config
-from kubernetes.client import ApiException
-
-
-@dataclass
-class PodInfo:
-    name: str
-    namespace: str
-    node: str
-    status: str
-    restarts: int
-    age: str
-    cpu: str
-    memory: str
-
-
-@dataclass
-class NodeInfo:
-    name: str
-    status: str
-    cpu_usage: str
-    mem_usage: str
-
-
-def parse_quantity(q: str) -> float:
-    if q is None:
-        return 0.0
-    q = str(q).strip()
-    if not q:
-        return 0.0
-
-    if q.endswith("n"):
-        return float(q[:-1]) / 1e9
-    if q.endswith("u"):
-        return float(q[:-1]) / 1e6
-    if q.endswith("m"):
-        return float(q[:-1]) / 1000.0
-
-    factors = {
-        "Ki": 1024,
-        "Mi": 1024**2,
-        "Gi": 1024**3,
-        "Ti": 1024**4,
-        "Pi": 1024**5,
-        "Ei": 1024**6,
-        "K": 1000,
-        "M": 1000**2,
-        "G": 1000**3,
-    }
-    for suffix, factor in factors.items():
-        if q.endswith(suffix):
-            return float(q[:-len(suffix)]) * factor
-
-    return float(q)
-
-
-class KubernetesBackend:
-    def __init__(self):
-        try:
-            config.load_incluster_config()
-        except config.ConfigException:
-            config.load_kube_config()
-
-        self.core = client.CoreV1Api()
-        self.custom = client.CustomObjectsApi()
-
-    def list_namespaces(self) -> List[str]:
-        ns_list = self.core.list_namespace()
-        return sorted([i.metadata.name for i in ns_list.items])
-
-    def _pod_metrics_by_ns(self) -> Dict[Tuple[str, str], Dict]:
-        metrics = {}
-        try:
-            pod_metrics = self.custom.list_cluster_custom_object(
-                group="metrics.k8s.io",
-                version="v1beta1",
-                plural="pods",
-            )
-        except ApiException:
-            return metrics
-
-        for item in pod_metrics.get("items", []):
-            ns = item["metadata"]["namespace"]
-            name = item["metadata"]["name"]
-            metrics[(ns, name)] = item
-        return metrics
-
-    def _node_metrics_by_name(self) -> Dict[str, Dict]:
-        metrics = {}
-        try:
-            node_metrics = self.custom.list_cluster_custom_object(
-                group="metrics.k8s.io",
-                version="v1beta1",
-                plural="nodes",
-            )
-        except ApiException:
-            return metrics
-
-        for item in node_metrics.get("items", []):
-            name = item["metadata"]["name"]
-            metrics[name] = item
-        return metrics
-
-    def list_pods_for_namespace(self, namespace: str) -> List[PodInfo]:
-        now = datetime.now(timezone.utc)
-        pod_list = self.core.list_namespaced_pod(namespace=namespace)
-        metrics = self._pod_metrics_by_ns()
-        pods: List[PodInfo] = []
-
-        for pod in pod_list.items:
-            name = pod.metadata.name
-            node = pod.spec.node_name or "N/A"
-            status = pod.status.phase or "Unknown"
-            restarts = 0
-            if pod.status.container_statuses:
-                restarts = sum(cs.restart_count for cs in pod.status.container_statuses)
-
-            start_time = pod.status.start_time or now
-            age_delta = now - start_time
-            days = age_delta.days
-            hours = age_delta.seconds // 3600
-            if days > 0:
-                age = f"{days}d{hours}h"
-            else:
-                mins = (age_delta.seconds % 3600) // 60
-                age = f"{hours}h{mins}m"
-
-            cpu_str = "-"
-            mem_str = "-"
-
-            m = metrics.get((namespace, name))
-            if m:
-                total_cpu_cores = 0.0
-                total_mem_bytes = 0.0
-                for c in m.get("containers", []):
-                    usage = c.get("usage", {})
-                    cpu_q = usage.get("cpu")
-                    mem_q = usage.get("memory")
-                    if cpu_q:
-                        total_cpu_cores += parse_quantity(cpu_q)
-                    if mem_q:
-                        total_mem_bytes += parse_quantity(mem_q)
-
-                cpu_m = int(total_cpu_cores * 1000)
-                if total_mem_bytes > 0:
-                    mem_mib = int(total_mem_bytes / (1024**2))
-                else:
-                    mem_mib = 0
-                cpu_str = f"{cpu_m}m"
-                mem_str = f"{mem_mib}Mi"
-
-            pods.append(
-                PodInfo(
-                    name=name,
-                    namespace=namespace,
-                    node=node,
-                    status=status,
-                    restarts=restarts,
-                    age=age,
-                    cpu=cpu_str,
-                    memory=mem_str,
-                )
-            )
-        return pods
-
-    def list_nodes(self) -> List[NodeInfo]:
-        node_list = self.core.list_node()
-        metrics = self._node_metrics_by_name()
-        nodes: List[NodeInfo] = []
-
-        for node in node_list.items:
-            name = node.metadata.name
-            conditions = {c.type: c.status for c in node.status.conditions or []}
-            ready = conditions.get("Ready", "Unknown")
-            status = "Ready" if ready == "True" else "NotReady"
-
-            cpu_capacity_cores = parse_quantity(node.status.capacity.get("cpu", "0"))
-            mem_capacity_bytes = parse_quantity(node.status.capacity.get("memory", "0"))
-
-            cpu_usage_pct = "-"
-            mem_usage_pct = "-"
-
-            m = metrics.get(name)
-            if m:
-                usage = m.get("usage", {})
-                cpu_used = parse_quantity(usage.get("cpu", "0"))
-                mem_used = parse_quantity(usage.get("memory", "0"))
-
-                if cpu_capacity_cores > 0:
-                    cpu_pct = cpu_used / cpu_capacity_cores * 100.0
-                    cpu_usage_pct = f"{cpu_pct:.1f}%"
-                if mem_capacity_bytes > 0:
-                    mem_pct = mem_used / mem_capacity_bytes * 100.0
-                    mem_usage_pct = f"{mem_pct:.1f}%"
-
-            nodes.append(
-                NodeInfo(
-                    name=name,
-                    status=status,
-                    cpu_usage=cpu_usage_pct,
-                    mem_usage=mem_usage_pct,
-                )
-            )
-
-        return nodes
-
-    def get_pod_logs(
-        self,
-        namespace: str,
-        pod: str,
-        container: Optional[str] = None,
-        tail_lines: int = 200,
-    ) -> str:
-        try:
-            return self.core.read_namespaced_pod_log(
-                name=pod,
-                namespace=namespace,
-                container=container,
-                tail_lines=tail_lines,
-                timestamps=True,
-            )
-        except ApiException as e:
-            return f"Error fetching logs: {e}\n"
+from k8s_raw import CacheSyncError
+from k8s_top_backend import (
+    LOG_BUFFER_LINES,
+    POD_SORT_KEYS,
+    POD_WINDOW_ROWS,
+    KubernetesBackend,
+    LogFollower,
+    NodeInfo,
+    PodInfo,
+)
+
+BACKEND_WORKERS = 4
+LOG_DEBOUNCE_SECONDS = 0.3
+LOG_DRAIN_INTERVAL_SECONDS = 0.5
+ALL_NAMESPACES = "*"
+TOP_N = 20
+
+
+NODE_COLUMNS = ("Node", "Status", "CPU", "Memory", "CPU Trend", "CPU Rate", "Mem Growth")
+POD_COLUMNS = (
+    "Pod",
+    "Status",
+    "CPU",
+    "Memory",
+    "CPU Trend",
+    "CPU Rate",
+    "Mem Growth",
+    "Restarts",
+    "Node",
+    "Age",
+)
+
+
+RANK_COLUMN = "rank"
+
+
+def add_table_columns(table: DataTable, columns: Tuple[str, ...]) -> None:
+    for column in columns:
+        table.add_column(column, key=column)
+    # Zero-width column holding each row's position, for sync_table_rows.
+    table.add_column("", width=0, key=RANK_COLUMN)
+
+
+def sync_table_rows(
+    table: DataTable,
+    rendered: Dict[str, Tuple[str, ...]],
+    rows: Dict[str, Tuple[str, ...]],
+    columns: Tuple[str, ...],
+) -> None:
+    for key in [k for k in rendered if k not in rows]:
+        table.remove_row(key)
+        del rendered[key]
+
+    for rank, (key, cells) in enumerate(rows.items()):
+        old = rendered.get(key)
+        if old is None:
+            table.add_row(*cells, rank, key=key)
+        else:
+            if old != cells:
+                for column, old_value, value in zip(columns, old, cells):
+                    if old_value != value:
+                        table.update_cell(key, column, value, update_width=True)
+            if table.get_cell(key, RANK_COLUMN) != rank:
+                table.update_cell(key, RANK_COLUMN, rank)
+        rendered[key] = cells
+
+    # New rows are appended, and sorted views reorder existing ones. Sorting
+    # on the rank column moves the rows in place; put the cursor back on
+    # the same key.
+    if [row.key.value for row in table.ordered_rows] != list(rows):
+        selected = selected_row_key(table)
+        table.sort(RANK_COLUMN)
+        if selected in rows:
+            table.move_cursor(row=list(rows).index(selected))
+
+
+def selected_row_key(table: DataTable) -> Optional[str]:
+    if table.row_count == 0 or table.cursor_row is None:
+        return None
+    try:
+        cell_key = table.coordinate_to_cell_key(Coordinate(table.cursor_row, 0))
+    except CellDoesNotExist:
+        return None
+    return cell_key.row_key.value
 
 
 class NodesTable(Static):
@@ -239,64 +102,78 @@ class NodesTable(Static):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.table = DataTable(zebra_stripes=True)
+        self._rendered: Dict[str, Tuple[str, ...]] = {}
 
     def compose(self) -> ComposeResult:
         yield self.table
 
     def on_mount(self) -> None:
         self.table.cursor_type = "row"
-        self.table.add_columns("Node", "Status", "CPU", "Memory")
+        add_table_columns(self.table, NODE_COLUMNS)
 
     def update_nodes(self, nodes: List[NodeInfo]) -> None:
-        self.table.clear()
-        for n in nodes:
-            self.table.add_row(n.name, n.status, n.cpu_usage, n.mem_usage)
+        rows = {
+            n.name: (
+                n.name,
+                n.status,
+                n.cpu_usage,
+                n.mem_usage,
+                n.cpu_trend,
+                n.cpu_rate,
+                n.mem_growth,
+            )
+            for n in nodes
+        }
+        sync_table_rows(self.table, self._rendered, rows, NODE_COLUMNS)
 
 
 class PodsTable(Static):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.table = DataTable(zebra_stripes=True)
-        self._pods: List[PodInfo] = []
+        self.summary = Static("Pods")
+        self._pods: Dict[str, PodInfo] = {}
+        self._rendered: Dict[str, Tuple[str, ...]] = {}
 
     def compose(self) -> ComposeResult:
+        yield self.summary
         yield self.table
 
     def on_mount(self) -> None:
         self.table.cursor_type = "row"
-        self.table.add_columns(
-            "Pod",
-            "Status",
-            "CPU",
-            "Memory",
-            "Restarts",
-            "Node",
-            "Age",
-        )
+        add_table_columns(self.table, POD_COLUMNS)
 
-    def update_pods(self, pods: List[PodInfo]) -> None:
-        self._pods = pods
-        self.table.clear()
-        for p in pods:
-            self.table.add_row(
-                p.name,
+    def update_pods(
+        self,
+        pods: List[PodInfo],
+        summary: str = "Pods",
+        show_namespace: bool = False,
+    ) -> None:
+        self.summary.update(summary)
+
+        self._pods = {f"{p.namespace}/{p.name}": p for p in pods}
+        rows = {
+            key: (
+                key if show_namespace else p.name,
                 p.status,
                 p.cpu,
                 p.memory,
+                p.cpu_trend,
+                p.cpu_rate,
+                p.mem_growth,
                 str(p.restarts),
                 p.node,
                 p.age,
             )
+            for key, p in self._pods.items()
+        }
+        sync_table_rows(self.table, self._rendered, rows, POD_COLUMNS)
 
     def get_selected_pod(self) -> Optional[PodInfo]:
-        if not self._pods:
-            return None
-        if self.table.cursor_row is None:
+        key = selected_row_key(self.table)
+        if key is None:
             return None
-        idx = self.table.cursor_row
-        if 0 <= idx < len(self._pods):
-            return self._pods[idx]
-        return None
+        return self._pods.get(key)
 
 
 class K8sTopApp(App):
@@ -305,6 +182,15 @@ class K8sTopApp(App):
     BINDINGS = [
         ("q", "quit", "Quit"),
         ("r", "refresh", "Refresh now"),
+        ("n", "next_page", "Next page"),
+        ("p", "prev_page", "Prev page"),
+        ("/", "focus_filter", "Filter"),
+        ("c", "sort('cpu')", "Sort CPU"),
+        ("m", "sort('memory')", "Sort Mem"),
+        ("x", "sort('restarts')", "Sort Restarts"),
+        ("a", "sort('age')", "Sort Age"),
+        ("o", "sort('')", "Default order"),
+        ("t", "toggle_top", "Top N"),
     ]
 
     namespaces: reactive[List[str]] = reactive(list)
@@ -313,6 +199,18 @@ class K8sTopApp(App):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.backend = KubernetesBackend()
+        self._executor = ThreadPoolExecutor(
+            max_workers=BACKEND_WORKERS, thread_name_prefix="k8s-top"
+        )
+        self._refresh_running = False
+        self._refresh_pending = False
+        self._follower: Optional[LogFollower] = None
+        self._log_seen = 0
+        self._log_debounce = None
+        self.pod_filter = ""
+        self.pod_offset = 0
+        self.pod_sort: Optional[str] = None
+        self.pod_top_n: Optional[int] = None
 
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True)
@@ -323,61 +221,175 @@ class K8sTopApp(App):
                 self.nodes_table = NodesTable()
                 yield self.nodes_table
             with Vertical():
+                self.pod_filter_input = Input(placeholder="Filter pods by namespace/name or node")
+                yield self.pod_filter_input
                 self.pods_table = PodsTable()
                 yield self.pods_table
-                self.logs = TextLog(highlight=True)
+                self.logs = TextLog(highlight=True, max_lines=LOG_BUFFER_LINES)
                 self.logs.write("Select a pod to view logs...")
                 yield self.logs
         yield Footer()
 
-    async def on_mount(self) -> None:
-        await self.refresh_all()
+    def on_mount(self) -> None:
+        self.run_worker(self.refresh_all(), group="refresh")
         self.set_interval(5.0, self.refresh_all)
-        self.set_interval(3.0, self.refresh_logs)
+        self.set_interval(LOG_DRAIN_INTERVAL_SECONDS, self.drain_logs)
+
+    def on_unmount(self) -> None:
+        if self._follower is not None:
+            self._follower.stop()
+        self.backend.close()
+        self._executor.shutdown(wait=False)
+
+    def action_refresh(self) -> None:
+        self.run_worker(self.refresh_all(), group="refresh")
+
+    def action_next_page(self) -> None:
+        self.pod_offset += POD_WINDOW_ROWS
+        self.run_worker(self.refresh_all(), group="refresh")
+
+    def action_prev_page(self) -> None:
+        self.pod_offset = max(0, self.pod_offset - POD_WINDOW_ROWS)
+        self.run_worker(self.refresh_all(), group="refresh")
+
+    def action_focus_filter(self) -> None:
+        self.pod_filter_input.focus()
+
+    def action_sort(self, sort_key: str) -> None:
+        self.pod_sort = sort_key if sort_key in POD_SORT_KEYS else None
+        self.pod_offset = 0
+        self.run_worker(self.refresh_all(), group="refresh")
 
-    async def action_refresh(self) -> None:
-        await self.refresh_all()
+    def action_toggle_top(self) -> None:
+        self.pod_top_n = None if self.pod_top_n else TOP_N
+        self.pod_offset = 0
+        self.run_worker(self.refresh_all(), group="refresh")
+
+    async def _call_backend(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
 
     async def refresh_all(self) -> None:
-        ns_list = self.backend.list_namespaces()
+        if self._refresh_running:
+            self._refresh_pending = True
+            return
+        self._refresh_running = True
+        try:
+            while True:
+                self._refresh_pending = False
+                try:
+                    if self.selected_namespace:
+                        await asyncio.gather(
+                            self._refresh_namespaces(),
+                            self._refresh_nodes(),
+                            self._refresh_pods(),
+                        )
+                    else:
+                        await asyncio.gather(
+                            self._refresh_namespaces(),
+                            self._refresh_nodes(),
+                        )
+                        await self._refresh_pods()
+                    self.sub_title = ""
+                except (CacheSyncError, TimeoutError) as exc:
+                    # The caches keep retrying; the next tick clears this.
+                    self.sub_title = f"Error: {exc}"
+                if not self._refresh_pending:
+                    break
+        finally:
+            self._refresh_running = False
+
+    async def _refresh_namespaces(self) -> None:
+        ns_list = await self._call_backend(self.backend.list_namespaces)
         if ns_list != self.namespaces:
             self.namespaces = ns_list
-            options = [(ns, ns) for ns in ns_list]
-            self.ns_select.options = options
+            options = [("All namespaces", ALL_NAMESPACES)]
+            options += [(ns, ns) for ns in ns_list]
+            self.ns_select.set_options(options)
             if not self.selected_namespace and ns_list:
                 self.selected_namespace = (
                     "default" if "default" in ns_list else ns_list[0]
                 )
                 self.ns_select.value = self.selected_namespace
 
-        nodes = self.backend.list_nodes()
+    async def _refresh_nodes(self) -> None:
+        nodes = await self._call_backend(self.backend.list_nodes)
         self.nodes_table.update_nodes(nodes)
 
-        if self.selected_namespace:
-            pods = self.backend.list_pods_for_namespace(self.selected_namespace)
-            self.pods_table.update_pods(pods)
+    async def _refresh_pods(self) -> None:
+        namespace = self.selected_namespace
+        if not namespace:
+            return
+        all_namespaces = namespace == ALL_NAMESPACES
+        total, offset, complete, pods = await self._call_backend(
+            self.backend.pod_window,
+            None if all_namespaces else namespace,
+            self.pod_filter,
+            self.pod_offset,
+            POD_WINDOW_ROWS,
+            self.pod_sort,
+            self.pod_top_n,
+        )
+        if namespace != self.selected_namespace:
+            return
 
-    async def refresh_logs(self) -> None:
+        self.pod_offset = offset
+        if self.pod_top_n:
+            summary = f"Top {len(pods)} by {self.pod_sort or 'cpu'} of {total} pods"
+        elif pods:
+            summary = f"Pods {offset + 1}-{offset + len(pods)} of {total}"
+            if self.pod_sort:
+                summary += f", by {self.pod_sort}"
+        else:
+            summary = f"Pods 0 of {total}"
+        if not complete:
+            summary += " (loading...)"
+        self.pods_table.update_pods(pods, summary, all_namespaces)
+
+    def follow_selected_pod(self) -> None:
         pod = self.pods_table.get_selected_pod()
         if not pod:
             return
-        logs = self.backend.get_pod_logs(pod.namespace, pod.name, tail_lines=200)
+        container = pod.containers[0] if pod.containers else None
+        target = (pod.namespace, pod.name, container)
+        if self._follower is not None:
+            if self._follower.target == target:
+                return
+            self._follower.stop()
+
         self.logs.clear()
-        if not logs:
-            self.logs.write("No logs.")
+        self._log_seen = 0
+        self._follower = self.backend.follow_pod_logs(*target)
+
+    def drain_logs(self) -> None:
+        if self._follower is None:
             return
-        for line in logs.splitlines():
+        self._log_seen, lines = self._follower.read_new(self._log_seen)
+        for line in lines:
             self.logs.write(line)
 
-    async def on_select_changed(self, event: Select.Changed) -> None:
+    def on_select_changed(self, event: Select.Changed) -> None:
         if event.select is self.ns_select:
             self.selected_namespace = event.value
-            await self.refresh_all()
+            self.pod_offset = 0
+            self.run_worker(self.refresh_all(), group="refresh")
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        if event.input is self.pod_filter_input:
+            self.pod_filter = event.value.strip()
+            self.pod_offset = 0
+            self.run_worker(self.refresh_all(), group="refresh")
 
-    async def on_data_table_row_highlighted(
+    def on_data_table_row_highlighted(
         self, event: DataTable.RowHighlighted
     ) -> None:
-        await self.refresh_logs()
+        if event.data_table is not self.pods_table.table:
+            return
+        if self._log_debounce is not None:
+            self._log_debounce.stop()
+        self._log_debounce = self.set_timer(
+            LOG_DEBOUNCE_SECONDS, self.follow_selected_pod
+        )
 
 
 if __name__ == "__main__":
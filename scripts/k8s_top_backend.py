@@ -0,0 +1,618 @@
+#!/usr/bin/env python3
+
+import heapq
+import threading
+import time
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from kubernetes import client, config
+from kubernetes.client import ApiException
+from kubernetes.watch.watch import iter_resp_lines
+
+from k8s_quantity import milli_value, sum_milli_groups
+from k8s_raw import ResourceCache, parse_time
+
+WATCH_RETRY_SECONDS = 5.0
+CACHE_SYNC_TIMEOUT_SECONDS = 60.0
+POD_WINDOW_ROWS = 100
+POD_SORT_KEYS = ("cpu", "memory", "restarts", "age")
+METRICS_GROUP = "metrics.k8s.io"
+METRICS_VERSION = "v1beta1"
+# metrics-server scrapes kubelets every 15s by default (--metric-resolution),
+# so re-querying inside that window only returns the same samples.
+METRICS_TTL_SECONDS = 15.0
+LOG_BUFFER_LINES = 1000
+LOG_TAIL_LINES = 200
+LOG_RESUME_SLACK_SECONDS = 5
+HISTORY_SAMPLES = 40
+HISTORY_IDLE_SECONDS = 600.0
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+@dataclass
+class PodInfo:
+    name: str
+    namespace: str
+    node: str
+    status: str
+    restarts: int
+    age: str
+    cpu: str
+    memory: str
+    containers: List[str] = field(default_factory=list)
+    cpu_milli: Optional[int] = None
+    memory_bytes: Optional[int] = None
+    cpu_trend: str = ""
+    cpu_rate: str = "-"
+    mem_growth: str = "-"
+
+
+@dataclass
+class NodeInfo:
+    name: str
+    status: str
+    cpu_usage: str
+    mem_usage: str
+    cpu_milli: Optional[int] = None
+    memory_bytes: Optional[int] = None
+    cpu_trend: str = ""
+    cpu_rate: str = "-"
+    mem_growth: str = "-"
+
+
+@dataclass
+class PodColumns:
+    # Compact column-per-field view of the pods in scope. Sorting and
+    # filtering work on row indices; PodInfo rows are only built for the
+    # window that is actually displayed.
+    namespaces: List[str] = field(default_factory=list)
+    names: List[str] = field(default_factory=list)
+    nodes: List[str] = field(default_factory=list)
+    statuses: List[str] = field(default_factory=list)
+    containers: List[List[str]] = field(default_factory=list)
+    restarts: array = field(default_factory=lambda: array("l"))
+    started: array = field(default_factory=lambda: array("d"))
+    cpu_milli: array = field(default_factory=lambda: array("q"))
+    memory_bytes: array = field(default_factory=lambda: array("q"))
+    complete: bool = True
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def key(self, i: int) -> str:
+        return f"{self.namespaces[i]}/{self.names[i]}"
+
+    def sort_value(self, sort_key: str) -> Callable[[int], float]:
+        # Larger is "heavier": most CPU/memory/restarts, oldest first.
+        if sort_key == "cpu":
+            return self.cpu_milli.__getitem__
+        if sort_key == "memory":
+            return self.memory_bytes.__getitem__
+        if sort_key == "restarts":
+            return self.restarts.__getitem__
+        if sort_key == "age":
+            return lambda i: -self.started[i]
+        raise ValueError(f"unknown sort key: {sort_key}")
+
+    def matching(self, text: str = "") -> List[int]:
+        if not text:
+            return list(range(len(self)))
+        text = text.lower()
+        return [
+            i
+            for i in range(len(self))
+            if text in f"{self.namespaces[i]}/{self.names[i]}".lower()
+            or text in self.nodes[i].lower()
+        ]
+
+
+class MetricsCache:
+    # Shared by the pod and node views. Pod metrics are fetched per
+    # namespace; a fresh cluster-wide entry also answers namespace lookups.
+
+    def __init__(self, custom: client.CustomObjectsApi, ttl: float = METRICS_TTL_SECONDS):
+        self._custom = custom
+        self._ttl = ttl
+        self._entries: Dict[Tuple[str, Optional[str]], Tuple[float, Dict[Any, Dict]]] = {}
+        self._lock = threading.Lock()
+        self._fetch_locks: Dict[Tuple[str, Optional[str]], threading.Lock] = {}
+
+    def pods(self, namespace: Optional[str] = None) -> Dict[Tuple[str, str], Dict]:
+        return self._get("pods", namespace)
+
+    def nodes(self) -> Dict[str, Dict]:
+        return self._get("nodes", None)
+
+    def _fresh(self, key: Tuple[str, Optional[str]]) -> Optional[Dict[Any, Dict]]:
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[0] < self._ttl:
+            return entry[1]
+        return None
+
+    def _get(self, plural: str, namespace: Optional[str]) -> Dict[Any, Dict]:
+        key = (plural, namespace)
+        with self._lock:
+            metrics = self._fresh(key)
+            if metrics is None and namespace is not None:
+                metrics = self._fresh((plural, None))
+            if metrics is not None:
+                return metrics
+            fetch_lock = self._fetch_locks.setdefault(key, threading.Lock())
+
+        with fetch_lock:
+            with self._lock:
+                metrics = self._fresh(key)
+            if metrics is None:
+                metrics = self._fetch(plural, namespace)
+                with self._lock:
+                    self._entries[key] = (time.monotonic(), metrics)
+            return metrics
+
+    def _fetch(self, plural: str, namespace: Optional[str]) -> Dict[Any, Dict]:
+        metrics: Dict[Any, Dict] = {}
+        try:
+            if namespace is None:
+                result = self._custom.list_cluster_custom_object(
+                    group=METRICS_GROUP,
+                    version=METRICS_VERSION,
+                    plural=plural,
+                )
+            else:
+                result = self._custom.list_namespaced_custom_object(
+                    group=METRICS_GROUP,
+                    version=METRICS_VERSION,
+                    namespace=namespace,
+                    plural=plural,
+                )
+        except ApiException:
+            return metrics
+
+        for item in result.get("items", []):
+            meta = item["metadata"]
+            if plural == "pods":
+                metrics[(meta["namespace"], meta["name"])] = item
+            else:
+                metrics[meta["name"]] = item
+        return metrics
+
+
+def _slope_per_minute(times: List[float], values: List[int]) -> Optional[float]:
+    n = len(times)
+    if n < 2:
+        return None
+    mean_t = sum(times) / n
+    mean_v = sum(values) / n
+    var_t = sum((t - mean_t) ** 2 for t in times)
+    if var_t == 0:
+        return None
+    cov = sum((t - mean_t) * (v - mean_v) for t, v in zip(times, values))
+    return cov / var_t * 60.0
+
+
+def sparkline(values: List[int]) -> str:
+    if not values:
+        return ""
+    low = min(values)
+    span = max(values) - low
+    if span == 0:
+        return SPARK_CHARS[0] * len(values)
+    top = len(SPARK_CHARS) - 1
+    return "".join(SPARK_CHARS[(v - low) * top // span] for v in values)
+
+
+class MetricsSeries:
+    __slots__ = ("times", "cpu", "memory", "head", "count", "stamp", "touched")
+
+    def __init__(self, size: int):
+        self.times = array("d", bytes(8 * size))
+        self.cpu = array("q", bytes(8 * size))
+        self.memory = array("q", bytes(8 * size))
+        self.head = 0
+        self.count = 0
+        self.stamp: Optional[str] = None
+        self.touched = 0.0
+
+    def ordered(self, ring: array) -> List:
+        size = len(ring)
+        start = (self.head - self.count) % size
+        return [ring[(start + i) % size] for i in range(self.count)]
+
+
+class MetricsHistory:
+    # Fixed-size CPU/memory rings per pod or node. A sample is only
+    # recorded when metrics-server reports a new scrape timestamp, and
+    # series that stop being updated are dropped after a while.
+
+    def __init__(self, size: int = HISTORY_SAMPLES, idle_seconds: float = HISTORY_IDLE_SECONDS):
+        self._size = size
+        self._idle_seconds = idle_seconds
+        self._series: Dict[str, MetricsSeries] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, stamp: Optional[str], cpu_milli: int, memory_bytes: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = MetricsSeries(self._size)
+            series.touched = now
+            if stamp is None or stamp == series.stamp:
+                return
+            series.stamp = stamp
+            series.times[series.head] = parse_time(stamp).timestamp()
+            series.cpu[series.head] = cpu_milli
+            series.memory[series.head] = memory_bytes
+            series.head = (series.head + 1) % self._size
+            series.count = min(series.count + 1, self._size)
+
+    def prune(self) -> None:
+        cutoff = time.monotonic() - self._idle_seconds
+        with self._lock:
+            for key in [k for k, s in self._series.items() if s.touched < cutoff]:
+                del self._series[key]
+
+    def trend(self, key: str) -> Tuple[str, str, str]:
+        with self._lock:
+            series = self._series.get(key)
+            if series is None or series.count == 0:
+                return "", "-", "-"
+            times = series.ordered(series.times)
+            cpu = series.ordered(series.cpu)
+            memory = series.ordered(series.memory)
+
+        cpu_rate = _slope_per_minute(times, cpu)
+        mem_rate = _slope_per_minute(times, memory)
+        cpu_rate_str = "-" if cpu_rate is None else f"{cpu_rate:+.0f}m/min"
+        mem_rate_str = "-" if mem_rate is None else f"{mem_rate / 1024**2:+.1f}Mi/min"
+        return sparkline(cpu), cpu_rate_str, mem_rate_str
+
+
+class KubernetesBackend:
+    def __init__(self):
+        try:
+            config.load_incluster_config()
+        except config.ConfigException:
+            config.load_kube_config()
+
+        self.core = client.CoreV1Api()
+        self.custom = client.CustomObjectsApi()
+        self.metrics = MetricsCache(self.custom)
+        self.pod_history = MetricsHistory()
+        self.node_history = MetricsHistory()
+
+        # Caches start on first use, so e.g. a nodes-only export never
+        # lists or watches pods.
+        self.namespace_cache = ResourceCache(self.core.list_namespace)
+        self.node_cache = ResourceCache(self.core.list_node)
+        self.pod_cache = ResourceCache(self.core.list_pod_for_all_namespaces)
+        self._started: List[ResourceCache] = []
+        self._start_lock = threading.Lock()
+
+    def _start(self, cache: ResourceCache) -> ResourceCache:
+        with self._start_lock:
+            if cache not in self._started:
+                cache.start()
+                self._started.append(cache)
+        return cache
+
+    def close(self) -> None:
+        with self._start_lock:
+            for cache in self._started:
+                cache.stop()
+
+    def list_namespaces(self) -> List[str]:
+        self._start(self.namespace_cache).ensure_synced(CACHE_SYNC_TIMEOUT_SECONDS)
+        return sorted(ns["metadata"]["name"] for ns in self.namespace_cache.items())
+
+    def pod_columns(self, namespace: Optional[str] = None) -> PodColumns:
+        now = time.time()
+        self._start(self.pod_cache).ensure_primed(CACHE_SYNC_TIMEOUT_SECONDS)
+        pod_items = sorted(
+            self.pod_cache.items(namespace),
+            key=lambda p: (p["metadata"]["namespace"], p["metadata"]["name"]),
+        )
+        metrics = self.metrics.pods(namespace)
+        cols = PodColumns(complete=self.pod_cache.synced)
+
+        cpu_quantities: List[Optional[str]] = []
+        mem_quantities: List[Optional[str]] = []
+        offsets = [0]
+        for pod in pod_items:
+            meta = pod["metadata"]
+            m = metrics.get((meta["namespace"], meta["name"])) or {}
+            for c in m.get("containers", []):
+                usage = c.get("usage", {})
+                cpu_quantities.append(usage.get("cpu"))
+                mem_quantities.append(usage.get("memory"))
+            offsets.append(len(cpu_quantities))
+        cpu_totals = sum_milli_groups(cpu_quantities, offsets)
+        mem_totals = sum_milli_groups(mem_quantities, offsets)
+
+        for pod, cpu_milli, mem_milli in zip(pod_items, cpu_totals, mem_totals):
+            ns = pod["metadata"]["namespace"]
+            name = pod["metadata"]["name"]
+            spec = pod.get("spec") or {}
+            status = pod.get("status") or {}
+            restarts = sum(cs.get("restartCount", 0) for cs in status.get("containerStatuses") or [])
+            start_time = parse_time(status.get("startTime"))
+
+            cols.namespaces.append(ns)
+            cols.names.append(name)
+            cols.nodes.append(spec.get("nodeName") or "N/A")
+            cols.statuses.append(status.get("phase") or "Unknown")
+            cols.containers.append([c["name"] for c in spec.get("containers") or []])
+            cols.restarts.append(restarts)
+            cols.started.append(start_time.timestamp() if start_time else now)
+
+            m = metrics.get((ns, name))
+            if m:
+                mem_bytes = mem_milli // 1000
+                cols.cpu_milli.append(cpu_milli)
+                cols.memory_bytes.append(mem_bytes)
+                self.pod_history.record(f"{ns}/{name}", m.get("timestamp"), cpu_milli, mem_bytes)
+            else:
+                cols.cpu_milli.append(-1)
+                cols.memory_bytes.append(-1)
+
+        self.pod_history.prune()
+        return cols
+
+    def pod_infos(self, cols: PodColumns, indices: Iterable[int]) -> List[PodInfo]:
+        now = time.time()
+        pods: List[PodInfo] = []
+
+        for i in indices:
+            age_delta = timedelta(seconds=max(0.0, now - cols.started[i]))
+            days = age_delta.days
+            hours = age_delta.seconds // 3600
+            if days > 0:
+                age = f"{days}d{hours}h"
+            else:
+                mins = (age_delta.seconds % 3600) // 60
+                age = f"{hours}h{mins}m"
+
+            cpu_str = "-"
+            mem_str = "-"
+            cpu_used: Optional[int] = None
+            mem_used: Optional[int] = None
+            if cols.cpu_milli[i] >= 0:
+                cpu_used = cols.cpu_milli[i]
+                mem_used = cols.memory_bytes[i]
+                cpu_str = f"{cpu_used}m"
+                mem_str = f"{mem_used // 1024**2}Mi"
+            cpu_trend, cpu_rate, mem_growth = self.pod_history.trend(cols.key(i))
+
+            pods.append(
+                PodInfo(
+                    name=cols.names[i],
+                    namespace=cols.namespaces[i],
+                    node=cols.nodes[i],
+                    status=cols.statuses[i],
+                    restarts=cols.restarts[i],
+                    age=age,
+                    cpu=cpu_str,
+                    memory=mem_str,
+                    containers=cols.containers[i],
+                    cpu_milli=cpu_used,
+                    memory_bytes=mem_used,
+                    cpu_trend=cpu_trend,
+                    cpu_rate=cpu_rate,
+                    mem_growth=mem_growth,
+                )
+            )
+        return pods
+
+    def list_pods(self, namespace: Optional[str] = None) -> List[PodInfo]:
+        # Unlike the TUI's pod_window, callers here want the whole set, so
+        # wait for the complete list rather than the first page.
+        self._start(self.pod_cache).ensure_synced(CACHE_SYNC_TIMEOUT_SECONDS)
+        cols = self.pod_columns(namespace)
+        return self.pod_infos(cols, range(len(cols)))
+
+    def pod_window(
+        self,
+        namespace: Optional[str] = None,
+        filter_text: str = "",
+        offset: int = 0,
+        limit: int = POD_WINDOW_ROWS,
+        sort_key: Optional[str] = None,
+        top_n: Optional[int] = None,
+    ) -> Tuple[int, int, bool, List[PodInfo]]:
+        cols = self.pod_columns(namespace)
+        indices = cols.matching(filter_text)
+        total = len(indices)
+
+        if top_n:
+            # Partial selection: O(n log k) instead of sorting every pod.
+            window = heapq.nlargest(top_n, indices, key=cols.sort_value(sort_key or "cpu"))
+            return total, 0, cols.complete, self.pod_infos(cols, window)
+
+        if sort_key:
+            indices.sort(key=cols.sort_value(sort_key), reverse=True)
+        offset = max(0, min(offset, (max(total, 1) - 1) // limit * limit))
+        window = indices[offset:offset + limit]
+        return total, offset, cols.complete, self.pod_infos(cols, window)
+
+    def list_nodes(self) -> List[NodeInfo]:
+        self._start(self.node_cache).ensure_synced(CACHE_SYNC_TIMEOUT_SECONDS)
+        node_items = sorted(self.node_cache.items(), key=lambda n: n["metadata"]["name"])
+        metrics = self.metrics.nodes()
+        nodes: List[NodeInfo] = []
+
+        for node in node_items:
+            name = node["metadata"]["name"]
+            node_status = node.get("status") or {}
+            conditions = {c["type"]: c["status"] for c in node_status.get("conditions") or []}
+            ready = conditions.get("Ready", "Unknown")
+            status = "Ready" if ready == "True" else "NotReady"
+
+            capacity = node_status.get("capacity") or {}
+            cpu_capacity = milli_value(capacity.get("cpu", "0"))
+            mem_capacity = milli_value(capacity.get("memory", "0"))
+
+            cpu_usage_pct = "-"
+            mem_usage_pct = "-"
+            cpu_milli: Optional[int] = None
+            mem_bytes: Optional[int] = None
+
+            m = metrics.get(name)
+            if m:
+                usage = m.get("usage", {})
+                cpu_used = milli_value(usage.get("cpu", "0"))
+                mem_used = milli_value(usage.get("memory", "0"))
+                cpu_milli = cpu_used
+                mem_bytes = mem_used // 1000
+                self.node_history.record(name, m.get("timestamp"), cpu_milli, mem_bytes)
+
+                if cpu_capacity > 0:
+                    cpu_pct = cpu_used / cpu_capacity * 100.0
+                    cpu_usage_pct = f"{cpu_pct:.1f}%"
+                if mem_capacity > 0:
+                    mem_pct = mem_used / mem_capacity * 100.0
+                    mem_usage_pct = f"{mem_pct:.1f}%"
+            cpu_trend, cpu_rate, mem_growth = self.node_history.trend(name)
+
+            nodes.append(
+                NodeInfo(
+                    name=name,
+                    status=status,
+                    cpu_usage=cpu_usage_pct,
+                    mem_usage=mem_usage_pct,
+                    cpu_milli=cpu_milli,
+                    memory_bytes=mem_bytes,
+                    cpu_trend=cpu_trend,
+                    cpu_rate=cpu_rate,
+                    mem_growth=mem_growth,
+                )
+            )
+
+        self.node_history.prune()
+        return nodes
+
+    def follow_pod_logs(
+        self,
+        namespace: str,
+        pod: str,
+        container: Optional[str] = None,
+    ) -> "LogFollower":
+        follower = LogFollower(self.core, namespace, pod, container)
+        follower.start()
+        return follower
+
+
+def _log_timestamp_key(line: str) -> str:
+    # RFC3339Nano drops trailing zeros from the fraction; pad it so
+    # timestamps compare correctly as strings.
+    ts = line.split(" ", 1)[0].rstrip("Z")
+    if "." in ts:
+        whole, frac = ts.split(".", 1)
+        return f"{whole}.{frac:0<9}"
+    return f"{ts}.000000000"
+
+
+class LogFollower:
+    # Follows one container's log stream into a fixed-size ring buffer.
+    # The client has no sinceTime parameter, so a dropped stream resumes
+    # with since_seconds plus some slack and skips lines at or before the
+    # last timestamp already buffered. The follower opens the streaming
+    # response itself so stop() can close it: a quiet pod would otherwise
+    # keep the thread and its connection blocked on the next line.
+
+    def __init__(
+        self,
+        core: client.CoreV1Api,
+        namespace: str,
+        pod: str,
+        container: Optional[str] = None,
+        max_lines: int = LOG_BUFFER_LINES,
+    ):
+        self.namespace = namespace
+        self.pod = pod
+        self.container = container
+        self._core = core
+        self._lines: Deque[str] = deque(maxlen=max_lines)
+        self._appended = 0
+        self._lock = threading.Lock()
+        self._last_key: Optional[str] = None
+        self._last_received: Optional[float] = None
+        self._stopped = threading.Event()
+        self._resp = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def target(self) -> Tuple[str, str, Optional[str]]:
+        return self.namespace, self.pod, self.container
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        resp = self._resp
+        if resp is not None:
+            resp.close()
+
+    def read_new(self, seen: int) -> Tuple[int, List[str]]:
+        with self._lock:
+            missing = min(self._appended - seen, len(self._lines))
+            if missing <= 0:
+                return self._appended, []
+            start = len(self._lines) - missing
+            return self._appended, [self._lines[i] for i in range(start, len(self._lines))]
+
+    def _append(self, line: str) -> None:
+        with self._lock:
+            self._lines.append(line)
+            self._appended += 1
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            kwargs: Dict[str, Any] = {
+                "name": self.pod,
+                "namespace": self.namespace,
+                "container": self.container,
+                "timestamps": True,
+            }
+            resume_after = self._last_key
+            if self._last_received is None:
+                kwargs["tail_lines"] = LOG_TAIL_LINES
+            else:
+                elapsed = time.time() - self._last_received
+                kwargs["since_seconds"] = int(elapsed) + LOG_RESUME_SLACK_SECONDS
+
+            resp = None
+            try:
+                resp = self._resp = self._core.read_namespaced_pod_log(
+                    follow=True, _preload_content=False, **kwargs
+                )
+                if self._stopped.is_set():
+                    # stop() ran before the response was published.
+                    return
+                for line in iter_resp_lines(resp):
+                    if self._stopped.is_set():
+                        return
+                    if not line:
+                        continue
+                    key = _log_timestamp_key(line)
+                    if resume_after is not None and key <= resume_after:
+                        continue
+                    self._last_key = key
+                    self._last_received = time.time()
+                    self._append(line)
+            except ApiException as e:
+                if not self._stopped.is_set():
+                    self._append(f"Error fetching logs: {e.status} {e.reason}")
+            except Exception as e:
+                # Closing the response from stop() ends up here too.
+                if not self._stopped.is_set():
+                    self._append(f"Log stream interrupted: {e}")
+            finally:
+                self._resp = None
+                if resp is not None:
+                    resp.close()
+                    resp.release_conn()
+            self._stopped.wait(WATCH_RETRY_SECONDS)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+# Headless k8s_top: emit the same node/pod rows as the TUI without Textual.
+#
+# Usage Examples:
+# python3 k8s_top_export.py --once
+# python3 k8s_top_export.py --once --resource nodes --output csv
+# python3 k8s_top_export.py --watch 30 -n kube-system -n default >> top.ndjson
+
+import argparse
+import csv
+import sys
+import time
+from dataclasses import asdict, fields
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, TextIO
+
+from k8s_audit import NdjsonRecordWriter
+from k8s_raw import CacheSyncError
+from k8s_top_backend import KubernetesBackend, NodeInfo, PodInfo
+
+
+def _record(kind: str, info, timestamp: str) -> Dict:
+    record = {"kind": kind, "timestamp": timestamp}
+    record.update(asdict(info))
+    return record
+
+
+def collect(
+    backend: KubernetesBackend,
+    resource: str,
+    namespaces: Optional[List[str]],
+) -> Iterable[Dict]:
+    timestamp = datetime.now(timezone.utc).isoformat()
+
+    if resource in ("nodes", "all"):
+        for node in backend.list_nodes():
+            yield _record("node", node, timestamp)
+
+    if resource in ("pods", "all"):
+        for ns in namespaces or [None]:
+            for pod in backend.list_pods(ns):
+                yield _record("pod", pod, timestamp)
+
+
+class CsvWriter:
+    def __init__(self, out: TextIO, columns: List[str]):
+        self._writer = csv.DictWriter(out, fieldnames=columns, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def write(self, record: Dict) -> None:
+        if "containers" in record:
+            record["containers"] = ";".join(record["containers"])
+        self._writer.writerow(record)
+
+
+def make_writer(output: str, resource: str, out: TextIO):
+    if output == "ndjson":
+        # Nodes and pods share the stream; every record key is written.
+        return NdjsonRecordWriter(out, [])
+    info_type = NodeInfo if resource == "nodes" else PodInfo
+    columns = ["kind", "timestamp"] + [f.name for f in fields(info_type)]
+    return CsvWriter(out, columns)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless k8s_top snapshot/stream exporter")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--once", action="store_true", help="Emit one snapshot and exit (default)")
+    mode.add_argument("--watch", type=float, metavar="SECONDS", help="Emit a snapshot every SECONDS")
+    parser.add_argument("--output", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--resource", choices=("pods", "nodes", "all"), default="all")
+    parser.add_argument(
+        "-n",
+        "--namespace",
+        action="append",
+        dest="namespaces",
+        help="Namespace to export pods from (repeatable, default: all)",
+    )
+    args = parser.parse_args()
+
+    if args.output == "csv" and args.resource == "all":
+        parser.error("--output csv needs --resource pods or --resource nodes")
+    if args.watch is not None and args.watch <= 0:
+        parser.error("--watch must be a positive number of seconds")
+
+    backend = KubernetesBackend()
+    writer = make_writer(args.output, args.resource, sys.stdout)
+    try:
+        while True:
+            started = time.monotonic()
+            for record in collect(backend, args.resource, args.namespaces):
+                writer.write(record)
+            sys.stdout.flush()
+            if args.watch is None:
+                break
+            time.sleep(max(0.0, args.watch - (time.monotonic() - started)))
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    except (CacheSyncError, TimeoutError) as exc:
+        print(f"Export failed: {exc}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()